@@ -1,97 +1,372 @@
 import gradio as gr
-import pandas as pd
+import asyncio
 import os
-import markdown2
-import matplotlib.pyplot as plt
-import io
-from PIL import Image
-
-# Load the data
-data_path = 'data/evaluations.csv'
-if not os.path.exists(data_path):
-    raise FileNotFoundError(f"Data file not found: {data_path}")
-data = pd.read_csv(data_path)
-
-# Load the prompt
-prompt_path = 'data/prompts/prompt.md'
-if not os.path.exists(prompt_path):
-    raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
-with open(prompt_path, 'r') as file:
-    prompt_content = file.read()
-
-# Load outputs
-outputs_path = 'data/outputs'
-if not os.path.exists(outputs_path):
-    raise FileNotFoundError(f"Outputs directory not found: {outputs_path}")
-output_files = sorted([f for f in os.listdir(outputs_path) if f.endswith('.md')], key=lambda x: int(x.replace('output', '').replace('.md', '')))
-
-# Create visualizations
-def create_bar_chart(data, column):
-    plt.figure(figsize=(10, 6))
-    data_sorted = data.sort_values(by=column, ascending=False)
-    plt.bar(data_sorted['model'], data_sorted[column])
-    plt.xlabel('Model')
-    plt.ylabel(column)
-    plt.title(column)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    
-    # Convert plot to image
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    image = Image.open(buf)
-    return image
+import sys
+import html
+import json
+import threading
+
+# Make the shared longcodegen package importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from longcodegen import profiling
+from longcodegen.cache import LRUCache, file_version
+from gradio.components.plot import PlotData
+
+from longcodegen.charts import bar_chart_file, cache_dir, chart_series, vega_lite_bar_spec
+from longcodegen.codeblocks import read_blocks
+from longcodegen.corpus import Corpus
+from longcodegen.htmlcache import highlight_css
+from longcodegen.sections import load_sections, outline, page_of_sections
+from longcodegen.storage import output_stat
+
+# Timing spans are off unless LONGCODEGEN_PROFILE=1; each event is one run
+profiling.configure()
+
+# The data folder; the outputs can be a folder or a packed archive
+# (data/outputs.lcgpack). Handlers call get_data() so a CSV republished by
+# `calculator.py --watch` is picked up on the next interaction
+corpus = Corpus('data')
+missing = corpus.missing()
+if missing:
+    raise FileNotFoundError(missing[0])
+data = corpus.evaluations()
+
+def get_data():
+    return corpus.evaluations()
+
+prompt_content = corpus.prompt()
+output_files = corpus.output_names()
+
+def get_output_files():
+    return corpus.output_names()
+
+# Serving limits: each event listener runs at most CONCURRENCY_LIMIT requests
+# at once, and requests beyond QUEUE_SIZE waiting are turned away rather than
+# piling up behind heavy work
+CONCURRENCY_LIMIT = int(os.environ.get('LONGCODEGEN_CONCURRENCY', 8))
+QUEUE_SIZE = int(os.environ.get('LONGCODEGEN_QUEUE_SIZE', 512))
+# Similarity and static chart rendering are CPU-bound, so fewer of them run at once
+HEAVY_CONCURRENCY_LIMIT = max(CONCURRENCY_LIMIT // 4, 1)
+
+# Interactive charts: only the data series and a Vega-Lite spec are sent and
+# the browser draws them, grouped the same way as in the Streamlit app
+CHART_COLUMNS = [('charcount', "Character Count"), ('codepercent', "Percentage of Code"), ('codeblocks', "Number of Code Blocks")]
+GROUPINGS = {"Model": ('model', 'accessui'), "Access UI": ('accessui', 'model')}
+
+# Assets shared by every visitor are computed once per version of the data:
+# the chart specs right away, the static chart images in the background at
+# startup (path of a PNG cached in memory and on disk by data hash)
+_assets = LRUCache(maxsize=2, name='gradio.assets')
+# One lock per asset, so the specs never wait for the images to render
+_asset_locks = {'specs': threading.Lock(), 'images': threading.Lock()}
+
+def shared_asset(name, build):
+    version = file_version(corpus.evaluations_path)
+    asset = _assets.get(name, version=version)
+    if asset is None:
+        with _asset_locks[name]:
+            asset = _assets.get(name, version=version)
+            if asset is None:
+                asset = build(get_data())
+                _assets.put(name, asset, version=version)
+    return asset
 
-# Define the Gradio interface
-def view_data():
-    return gr.HTML(data.to_html(index=False))
+def chart_spec(data, column, label, x, color):
+    # The data goes inline with the spec; Gradio's Plot draws altair-type plots
+    # from the Vega-Lite JSON alone, so altair itself isn't needed
+    spec = vega_lite_bar_spec(column, x, color, title=label)
+    spec['data'] = {'values': json.loads(chart_series(data, column, x, color).to_json(orient='records'))}
+    return json.dumps(spec)
+
+def chart_specs_by_grouping():
+    return shared_asset('specs', lambda data: {
+        group_by: [chart_spec(data, column, label, x, color) for column, label in CHART_COLUMNS]
+        for group_by, (x, color) in GROUPINGS.items()})
+
+def chart_images():
+    return shared_asset('images', lambda data: [bar_chart_file(data, column, 'model') for column, _ in CHART_COLUMNS])
+
+# Rendering the images imports matplotlib, so it stays off the startup path
+chart_thread = threading.Thread(target=chart_images, name='chart-images', daemon=True)
+chart_thread.start()
+
+# Pages of outputs as rendered HTML, shared by every visitor until the output changes
+_output_pages = LRUCache(maxsize=512, name='gradio.output_pages')
+
+def render_output(name, first, pages, code_only):
+    """(HTML, outline choices, units left) for a page of an output, rendered once per version."""
+    output_path = corpus.storage.path_of(name)
+    version = output_stat(output_path)
+    key = (name, first, pages, code_only)
+    page = _output_pages.get(key, version=version)
+    if page is None:
+        page = (render_output_code if code_only else render_output_sections)(output_path, first, pages)
+        _output_pages.put(key, page, version=version)
+    return page
+
+def render_output_sections(output_path, first, pages):
+    # Sections come pre-rendered from the HTML cache filled at ingest; misses
+    # are rendered and stored for the next visitor
+    sections = load_sections(output_path)
+    shown = page_of_sections(sections, first, pages) if sections else []
+    parts = corpus.html_cache().render_sections(output_path, [sections[index] for index in shown])
+    remaining = len(sections) - shown[-1] - 1 if shown else 0
+    return "\n".join(parts), outline(sections), f"{remaining} sections left" if remaining else ""
+
+def render_output_code(output_path, first, pages):
+    # Blocks come from the ingest-time offset index and are copied out of a
+    # memory map, so the prose is never read
+    blocks = corpus.code_index().blocks(os.path.basename(output_path))
+    if not blocks:
+        return "This output has no code blocks", [], ""
+    shown = page_of_sections(blocks, first, pages)
+    texts = read_blocks(output_path, [blocks[index] for index in shown])
+    highlighted = corpus.html_cache().render([(text, 'code', blocks[index].language)
+                                              for index, text in zip(shown, texts)])
+    parts = []
+    for index, code in zip(shown, highlighted):
+        block = blocks[index]
+        parts.append(f"<p><b>Block {index + 1} of {len(blocks)}</b> · {html.escape(block.language or 'untagged')} · "
+                     f"{block.lines} line{'s' if block.lines != 1 else ''}</p>" + code)
+    choices = [(f"Block {index + 1} ({block.language or 'untagged'})", index)
+               for index, block in enumerate(blocks)]
+    remaining = len(blocks) - shown[-1] - 1
+    return "\n".join(parts), choices, f"{remaining} blocks left" if remaining else ""
+
+# Define the Gradio interface. Handlers that read files are async and hand
+# the work to a thread, so the event loop keeps serving other visitors
+@profiling.profiled('view.data')
+def render_data(page, page_size, sort_by, descending):
+    """One page of the table as HTML, so the browser never receives the whole table."""
+    page, page_size = max(int(page or 1), 1), int(page_size)
+    rows, total = corpus.table_page(page - 1, page_size, None if sort_by == "(file order)" else sort_by,
+                                    not descending)
+    first = (page - 1) * page_size
+    summary = f"<p>Rows {min(first + 1, total)} to {min(first + page_size, total)} of {total}</p>"
+    return rows.to_html(index=False, float_format='{:.2f}'.format) + summary
+
+@profiling.profiled_run('gradio.view_data')
+async def view_data(page=1, page_size=50, sort_by="(file order)", descending=True):
+    return gr.HTML(await asyncio.to_thread(render_data, page, page_size, sort_by, descending))
 
 def view_prompt():
     return gr.Markdown(prompt_content)
 
-def view_output(file_index):
+@profiling.profiled('view.output')
+def view_output(file_index, first=0, pages=1, code_only=False):
+    """Render a page of sections from the selected one; returns the view, outline, page count and load-more button."""
+    file_index, first = int(file_index), int(first or 0)
+    output_files = get_output_files()
     if file_index < 0 or file_index >= len(output_files):
-        return "Invalid file index"
-    with open(os.path.join(outputs_path, output_files[file_index]), 'r') as file:
-        output_content = file.read()
-    return gr.Markdown(markdown2.markdown(output_content))
+        return "Invalid file index", gr.update(choices=[], value=None), 1, gr.update(visible=False)
+    content, choices, remaining = render_output(output_files[file_index], first, pages, code_only)
+    return (gr.HTML(content), gr.update(choices=choices, value=first if choices else None), pages,
+            gr.update(value=f"Load more ({remaining})", visible=bool(remaining)))
+
+@profiling.profiled_run('gradio.open_output')
+async def open_output(file_index, code_only):
+    return await asyncio.to_thread(view_output, file_index, 0, 1, code_only)
+
+@profiling.profiled_run('gradio.jump_to_output_section')
+async def jump_to_output_section(file_index, first, code_only):
+    return await asyncio.to_thread(view_output, file_index, first, 1, code_only)
+
+@profiling.profiled_run('gradio.load_more_output')
+async def load_more_output(file_index, first, pages, code_only):
+    return await asyncio.to_thread(view_output, file_index, first, pages + 1, code_only)
+
+def render_search(query, scope, models, accessuis):
+    hits = corpus.search_index().search(query, scope.lower(), models, accessuis)
+    if not hits:
+        return "<p>No matches</p>" if query.strip() else ""
+    results = []
+    for hit in hits:
+        output_name = os.path.basename(hit.path)
+        position = corpus.output_index(output_name)
+        location = f" (output index {position})" if position is not None else ""
+        results.append(f"<p><b>{html.escape(hit.model or output_name)}</b> · {html.escape(hit.accessui)} · "
+                       f"<code>{html.escape(output_name)}</code>{location}</p>"
+                       f'<pre style="white-space: pre-wrap">{hit.snippet}</pre>')
+    return "\n".join(results)
 
+@profiling.profiled_run('gradio.search_outputs')
+async def search_outputs(query, scope, models, accessuis):
+    return await asyncio.to_thread(render_search, query, scope, models, accessuis)
+
+def render_similarity(model):
+    matrices = corpus.model_similarity()
+    if model not in matrices:
+        return "<p>No model has more than one output yet</p>" if not matrices else ""
+    return matrices[model].to_html(float_format='{:.2f}'.format)
+
+@profiling.profiled_run('gradio.view_similarity')
+async def view_similarity(model):
+    return await asyncio.to_thread(render_similarity, model)
+
+def render_similar_outputs(threshold):
+    pairs = corpus.similar_outputs(threshold)
+    if not pairs:
+        return "<p>No pairs above the threshold</p>"
+    items = "".join(f"<li><code>{html.escape(os.path.basename(first))}</code> and "
+                    f"<code>{html.escape(os.path.basename(second))}</code>: {similarity:.2f}</li>"
+                    for first, second, similarity in pairs)
+    return f"<ul>{items}</ul>"
+
+@profiling.profiled_run('gradio.view_similar_outputs')
+async def view_similar_outputs(threshold):
+    return await asyncio.to_thread(render_similar_outputs, threshold)
+
+# The search index and the MinHash signatures are built the first time their
+# tab is opened, not while the Blocks are built, so startup doesn't scan the corpus
+def render_search_facets():
+    models, accessuis = corpus.search_index().facets()
+    return gr.update(choices=models), gr.update(choices=accessuis)
+
+@profiling.profiled_run('gradio.open_search')
+async def open_search():
+    return await asyncio.to_thread(render_search_facets)
+
+def render_similarity_tab(model, threshold):
+    models = list(corpus.model_similarity())
+    model = model if model in models else (models[0] if models else None)
+    return gr.update(choices=models, value=model), render_similarity(model), render_similar_outputs(threshold)
+
+@profiling.profiled_run('gradio.open_similarity')
+async def open_similarity(model, threshold):
+    return await asyncio.to_thread(render_similarity_tab, model, threshold)
+
+@profiling.profiled('view.create_plots')
 def create_plots():
-    charcount_plot = create_bar_chart(data, 'charcount')
-    codepercent_plot = create_bar_chart(data, 'codepercent')
-    codeblocks_plot = create_bar_chart(data, 'codeblocks')
-    return charcount_plot, codepercent_plot, codeblocks_plot
+    return chart_images()
+
+@profiling.profiled_run('gradio.create_interactive_plots')
+def create_interactive_plots(group_by):
+    # Bars are offset by the colour field rather than stacked, so each bar is
+    # the mean of one group
+    return [gr.Plot(value=PlotData(type='altair', plot=spec), label=label)
+            for spec, (_, label) in zip(chart_specs_by_grouping()[group_by], CHART_COLUMNS)]
+
+@profiling.profiled_run('gradio.set_chart_mode')
+async def set_chart_mode(mode):
+    interactive = mode == "Interactive"
+    # The images are normally ready: they are rendered in the background at startup
+    images = [gr.update()] * 3 if interactive else list(await asyncio.to_thread(create_plots))
+    return [gr.update(visible=interactive), gr.update(visible=interactive), gr.update(visible=not interactive)] + images
+
+def html_table(headers, rows):
+    head = "".join(f"<th>{html.escape(header)}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+def view_profile():
+    # Debug panel: the steps of the last few events and how often the caches hit
+    parts = []
+    for run in profiling.recent_runs(10):
+        parts.append(f"<p><b>{html.escape(run.name)}</b> (run {run.id}): {run.duration * 1000:.1f} ms</p>"
+                     + html_table(["Step", "ms"], [(name, f"{ms:.2f}") for name, ms in profiling.run_steps(run)]))
+    stats = [(name, hits, misses, "-" if rate is None else f"{rate * 100:.1f}%", entries)
+             for name, hits, misses, rate, entries in profiling.cache_stats()]
+    parts.append("<p><b>Caches</b></p>" + html_table(["Cache", "Hits", "Misses", "Hit rate", "Entries"], stats))
+    return "\n".join(parts)
 
 with gr.Blocks() as demo:
     gr.Markdown("# Model Evaluations and Outputs")
     
     with gr.Tab("Data"):
-        data_view = gr.Button("View Data")
+        with gr.Row():
+            data_sort = gr.Dropdown(["(file order)"] + list(data.columns), value="(file order)", label="Sort by")
+            data_descending = gr.Checkbox(value=True, label="Descending")
+            data_page_size = gr.Dropdown([25, 50, 100, 500], value=50, label="Rows per page")
+            data_page = gr.Number(value=1, precision=0, minimum=1, label="Page")
+            data_view = gr.Button("View Data")
         data_output = gr.HTML()
-        data_view.click(fn=view_data, inputs=None, outputs=data_output)
+        data_inputs = [data_page, data_page_size, data_sort, data_descending]
+
+        data_view.click(fn=view_data, inputs=data_inputs, outputs=data_output)
+        for control in data_inputs:
+            control.change(fn=view_data, inputs=data_inputs, outputs=data_output)
     
     with gr.Tab("Visualizations"):
-        with gr.Row():
+        chart_mode = gr.Radio(["Interactive", "Static image"], value="Interactive", label="Chart mode")
+        group_by = gr.Radio(["Model", "Access UI"], value="Model", label="Group by")
+        with gr.Column() as interactive_plots:
+            charcount_bars, codepercent_bars, codeblocks_bars = create_interactive_plots("Model")
+        with gr.Row(visible=False) as static_plots:
             charcount_plot = gr.Image(label="Character Count")
             codepercent_plot = gr.Image(label="Percentage of Code")
             codeblocks_plot = gr.Image(label="Number of Code Blocks")
-        
-        # Update the plots using gr.update
-        charcount_plot.update(value=create_bar_chart(data, 'charcount'))
-        codepercent_plot.update(value=create_bar_chart(data, 'codepercent'))
-        codeblocks_plot.update(value=create_bar_chart(data, 'codeblocks'))
+
+        group_by.change(fn=create_interactive_plots, inputs=group_by,
+                        outputs=[charcount_bars, codepercent_bars, codeblocks_bars])
+        chart_mode.change(fn=set_chart_mode, inputs=chart_mode,
+                          outputs=[group_by, interactive_plots, static_plots, charcount_plot, codepercent_plot, codeblocks_plot],
+                          concurrency_limit=HEAVY_CONCURRENCY_LIMIT)
     
     with gr.Tab("Outputs"):
         with gr.Row():
-            output_index = gr.Number(label="Output Index (0 to {})".format(len(output_files) - 1), value=0)
+            output_index = gr.Number(label="Output Index (0 to {})".format(len(output_files) - 1), value=0, precision=0)
             output_view = gr.Button("View Output")
-            output_display = gr.Markdown()
-        
-        output_view.click(fn=view_output, inputs=output_index, outputs=output_display)
+            output_code_only = gr.Checkbox(label="Code only")
+        # Long outputs are shown a page of sections at a time
+        output_section = gr.Dropdown(label="Jump to section", choices=[])
+        output_pages = gr.State(1)
+        output_display = gr.HTML()
+        output_more = gr.Button("Load more", visible=False)
+        output_widgets = [output_display, output_section, output_pages, output_more]
+
+        output_view.click(fn=open_output, inputs=[output_index, output_code_only], outputs=output_widgets)
+        output_code_only.change(fn=open_output, inputs=[output_index, output_code_only], outputs=output_widgets)
+        output_section.input(fn=jump_to_output_section, inputs=[output_index, output_section, output_code_only],
+                             outputs=output_widgets)
+        output_more.click(fn=load_more_output, inputs=[output_index, output_section, output_pages, output_code_only],
+                          outputs=output_widgets)
     
     with gr.Tab("Prompt"):
         prompt_display = gr.Markdown(prompt_content)
 
-# Launch the app
-demo.launch()
\ No newline at end of file
+    with gr.Tab("Search") as search_tab:
+        with gr.Row():
+            search_query = gr.Textbox(label="Search outputs", placeholder='Words or "exact phrases", e.g. pyqt5 "global shortcut"')
+            search_scope = gr.Radio(["All", "Prose", "Code"], value="All", label="Search in")
+        with gr.Row():
+            search_model = gr.Dropdown([], multiselect=True, label="Model")
+            search_accessui = gr.Dropdown([], multiselect=True, label="Access UI")
+        search_results = gr.HTML()
+        search_inputs = [search_query, search_scope, search_model, search_accessui]
+
+        search_tab.select(fn=open_search, outputs=[search_model, search_accessui])
+        search_query.submit(fn=search_outputs, inputs=search_inputs, outputs=search_results)
+        for control in (search_scope, search_model, search_accessui):
+            control.change(fn=search_outputs, inputs=search_inputs, outputs=search_results)
+
+    with gr.Tab("Similarity") as similarity_tab:
+        # Estimated Jaccard similarity of word 5-grams, from MinHash signatures
+        similarity_model = gr.Dropdown([], label="Model")
+        similarity_matrix = gr.HTML()
+        gr.Markdown("### Similar outputs across all models")
+        similarity_threshold = gr.Slider(0.1, 1.0, value=0.5, step=0.05, label="Minimum similarity")
+        similar_pairs = gr.HTML()
+
+        similarity_model.change(fn=view_similarity, inputs=similarity_model, outputs=similarity_matrix,
+                                concurrency_limit=HEAVY_CONCURRENCY_LIMIT)
+        similarity_threshold.change(fn=view_similar_outputs, inputs=similarity_threshold, outputs=similar_pairs,
+                                    concurrency_limit=HEAVY_CONCURRENCY_LIMIT)
+        similarity_tab.select(fn=open_similarity, inputs=[similarity_model, similarity_threshold],
+                              outputs=[similarity_model, similarity_matrix, similar_pairs],
+                              concurrency_limit=HEAVY_CONCURRENCY_LIMIT)
+
+    if profiling.enabled():
+        with gr.Tab("Profiling"):
+            profile_refresh = gr.Button("Refresh")
+            profile_display = gr.HTML()
+            profile_refresh.click(fn=view_profile, outputs=profile_display)
+            demo.load(fn=view_profile, outputs=profile_display)
+
+# Requests wait in a bounded queue; once QUEUE_SIZE are waiting, new ones are
+# rejected with a "queue full" error instead of timing out
+demo.queue(max_size=QUEUE_SIZE, default_concurrency_limit=CONCURRENCY_LIMIT)
+
+# Launch the app; cached chart images are served straight from the chart cache,
+# and the style of the highlighted code in outputs is loaded once per page
+demo.launch(css=highlight_css(), allowed_paths=[cache_dir()])
\ No newline at end of file
@@ -1,88 +1,218 @@
 import streamlit as st
-import pandas as pd
 import os
-import markdown2
-import matplotlib.pyplot as plt
-from PIL import Image
-import io
+import sys
 
 # Get the directory where the script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Construct the paths relative to the script's location
-data_path = os.path.join(script_dir, 'data', 'evaluations.csv')
-prompt_path = os.path.join(script_dir, 'data', 'prompts', 'prompt.md')
-outputs_path = os.path.join(script_dir, 'data', 'outputs')
+# Make the shared longcodegen package importable
+sys.path.insert(0, os.path.dirname(script_dir))
 
-# Load the data
-if not os.path.exists(data_path):
-    st.error(f"Data file not found: {data_path}")
-    st.stop()
-data = pd.read_csv(data_path)
-
-# Rename columns for better readability
-data.rename(columns={
-    'model': 'Model',
-    'accessUI': 'Access UI',
-    'codepercent': 'Code Percentage',
-    'codechars': 'Code Characters',
-    'charcount': 'Character Count',
-    'codeblocks': 'Code Blocks',
-    'output_number': 'Output Number'
-}, inplace=True)
-
-# Load the prompt
-if not os.path.exists(prompt_path):
-    st.error(f"Prompt file not found: {prompt_path}")
-    st.stop()
-with open(prompt_path, 'r') as file:
-    prompt_content = file.read()
+from longcodegen import profiling
+from longcodegen.analytics import METHODOLOGY, METRIC_COLUMNS, build_report, findings, metric_table
+from longcodegen.charts import (bar_chart_png, chart_series, similarity_series, vega_lite_bar_spec,
+                                vega_lite_heatmap_spec)
+from longcodegen.codeblocks import read_blocks
+from longcodegen.corpus import Corpus
+from longcodegen.data import DISPLAY_COLUMNS
+from longcodegen.htmlcache import highlight_css
+from longcodegen.sections import load_sections, outline, page_of_sections
+
+# Timing spans are off unless LONGCODEGEN_PROFILE=1; each rerun is one run
+profiling.configure()
+profiling_run = profiling.start_run('streamlit.rerun')
 
-# Load outputs
-if not os.path.exists(outputs_path):
-    st.error(f"Outputs directory not found: {outputs_path}")
+# The data folder next to the script; the outputs can be a folder or a packed
+# archive (data/outputs.lcgpack). The table is loaded (and pandas imported)
+# only by the views that show it, cached across reruns until the file changes
+corpus = Corpus(os.path.join(script_dir, 'data'))
+missing = corpus.missing()
+for message in missing:
+    st.error(message)
+if missing:
     st.stop()
-output_files = sorted([f for f in os.listdir(outputs_path) if f.endswith('.md')], key=lambda x: int(x.replace('output', '').replace('.md', '')))
 
-# Create visualizations
+def get_data():
+    # Columns renamed for better readability
+    return corpus.evaluations(True)
+
+output_files = corpus.output_names()
+
+# Create visualizations (PNG bytes, cached in memory and on disk by data hash)
 def create_bar_chart(data, column):
-    plt.figure(figsize=(10, 6))
-    data_sorted = data.sort_values(by=column, ascending=False)
-    plt.bar(data_sorted['Model'], data_sorted[column])
-    plt.xlabel('Model')
-    plt.ylabel(column)
-    plt.title(column)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    
-    # Convert plot to image
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    image = Image.open(buf)
-    return image
+    return bar_chart_png(data, column, 'Model')
 
 # Define the Streamlit interface
+@profiling.profiled('view.data')
 def view_data():
-    st.dataframe(data, height=600)  # Increase height to avoid scrolling
+    # Only one page of the table is sent to the browser; sorting happens here
+    data = get_data()
+    controls = st.columns(4)
+    sort_by = controls[0].selectbox("Sort by", ["(file order)"] + list(data.columns))
+    descending = controls[1].toggle("Descending", value=True)
+    page_size = controls[2].selectbox("Rows per page", [25, 50, 100, 500], index=1)
+    total = len(data)
+    page_count = max((total + page_size - 1) // page_size, 1)
+    page = controls[3].number_input(f"Page (1 to {page_count})", min_value=1, max_value=page_count, value=1, step=1)
 
+    rows, total = corpus.table_page(page - 1, page_size, None if sort_by == "(file order)" else sort_by,
+                                    not descending, True)
+    st.dataframe(rows, height=600, hide_index=True,  # Increase height to avoid scrolling
+                 column_config={"Code Percentage": st.column_config.NumberColumn(format="%.2f")})
+    first = (page - 1) * page_size
+    st.caption(f"Rows {min(first + 1, total)} to {min(first + page_size, total)} of {total}")
+
+@profiling.profiled('view.prompt')
 def view_prompt():
-    st.markdown(prompt_content)
+    st.markdown(corpus.prompt())
+
+def load_more(pages_key):
+    st.session_state[pages_key] = st.session_state.get(pages_key, 1) + 1
 
-def view_output(file_index):
+@profiling.profiled('view.output')
+def view_output(file_index, code_only=False):
     if file_index < 0 or file_index >= len(output_files):
         st.error("Invalid file index")
         return
-    with open(os.path.join(outputs_path, output_files[file_index]), 'r') as file:
-        output_content = file.read()
-    st.markdown(output_content)
+    output_path = corpus.output_path(file_index)
+    if code_only:
+        view_output_code(output_path, file_index)
+        return
+    sections = load_sections(output_path)
+    if not sections:
+        return
+
+    # Only a page of sections is rendered, starting from the one picked in the
+    # outline; the rest is read from disk when asked for
+    first = 0
+    entries = outline(sections)
+    if len(entries) > 1:
+        labels = dict((index, label) for label, index in entries)
+        first = st.selectbox("Jump to section", list(labels), format_func=labels.__getitem__,
+                             key=f"output_section_{file_index}")
+    pages_key = f"output_pages_{file_index}_{first}"
+    shown = page_of_sections(sections, first, st.session_state.get(pages_key, 1))
+    # Sections come pre-rendered (and sanitized) from the HTML cache filled at
+    # ingest, so neither the server nor the browser parses the Markdown
+    st.html(f"<style>{highlight_css()}</style>")
+    for section_html in corpus.html_cache().render_sections(output_path, [sections[index] for index in shown]):
+        st.html(section_html)
+
+    remaining = len(sections) - shown[-1] - 1
+    if remaining:
+        st.button(f"Load more ({remaining} sections left)", key=f"load_more_{pages_key}",
+                  on_click=load_more, args=(pages_key,))
+
+def view_output_code(output_path, file_index):
+    # Blocks come from the ingest-time offset index and are copied out of a
+    # memory map, so the prose is never read
+    blocks = corpus.code_index().blocks(os.path.basename(output_path))
+    if not blocks:
+        st.info("This output has no code blocks")
+        return
+    pages_key = f"output_code_pages_{file_index}"
+    shown = [blocks[index] for index in page_of_sections(blocks, 0, st.session_state.get(pages_key, 1))]
+    highlighted = corpus.html_cache().render([(text, 'code', block.language)
+                                              for block, text in zip(shown, read_blocks(output_path, shown))])
+    st.html(f"<style>{highlight_css()}</style>")
+    for number, (block, code) in enumerate(zip(shown, highlighted), start=1):
+        st.caption(f"Block {number} of {len(blocks)} · {block.language or 'untagged'} · {block.lines} line{'s' if block.lines != 1 else ''}")
+        st.html(code)
+
+    remaining = len(blocks) - len(shown)
+    if remaining:
+        st.button(f"Load more ({remaining} blocks left)", key=f"load_more_{pages_key}",
+                  on_click=load_more, args=(pages_key,))
+
+@profiling.profiled('view.search')
+def view_search():
+    index = corpus.search_index()
+    models, accessuis = index.facets()
+    query = st.text_input("Search outputs", placeholder='Words or "exact phrases", e.g. pyqt5 "global shortcut"')
+    scope = st.radio("Search in", ["All", "Prose", "Code"], horizontal=True)
+    model_filter = st.multiselect("Model", models)
+    accessui_filter = st.multiselect("Access UI", accessuis)
+    if not query:
+        return
+    hits = index.search(query, scope.lower(), model_filter, accessui_filter)
+    if not hits:
+        st.info("No matches")
+    for hit in hits:
+        # The output index matches the Outputs view's numbering
+        output_name = os.path.basename(hit.path)
+        position = corpus.output_index(output_name)
+        st.markdown(f"**{hit.model or output_name}** · {hit.accessui} · `{output_name}`"
+                    + (f" (output index {position})" if position is not None else ""))
+        st.markdown(f'<pre style="white-space: pre-wrap">{hit.snippet}</pre>', unsafe_allow_html=True)
+
+@profiling.profiled('view.similarity')
+def view_similarity():
+    # Estimated Jaccard similarity of word 5-grams, from MinHash signatures
+    matrices = corpus.model_similarity()
+    if matrices:
+        model = st.selectbox("Model", list(matrices))
+        matrix = matrices[model]
+        st.vega_lite_chart(similarity_series(matrix), vega_lite_heatmap_spec(f"{model}: similarity between outputs"),
+                           width="stretch")
+        st.dataframe(matrix.style.format("{:.2f}"))
+    else:
+        st.info("No model has more than one output yet")
+
+    st.subheader("Similar outputs across all models")
+    threshold = st.slider("Minimum similarity", 0.1, 1.0, 0.5, 0.05)
+    pairs = corpus.similar_outputs(threshold)
+    if not pairs:
+        st.caption("No pairs above the threshold")
+    for first, second, similarity in pairs:
+        st.markdown(f"`{os.path.basename(first)}` and `{os.path.basename(second)}`: {similarity:.2f}")
 
+@profiling.profiled('view.report')
+def view_report():
+    st.markdown(METHODOLOGY)
+    # The findings are computed from the data (once per version of the CSV)
+    report = build_report(corpus.evaluations_path)
+    st.subheader(f"Findings across {report.runs} runs")
+    st.markdown(findings(report))
+
+    labels = {column: DISPLAY_COLUMNS[column] for column in METRIC_COLUMNS}
+    metric = st.radio("Metric", METRIC_COLUMNS, format_func=labels.__getitem__, horizontal=True)
+    st.caption("Spread is how much shorter a group's smallest run is than its largest; 0 for a single run.")
+    number_format = {"Mean": "{:,.2f}", "Variance": "{:,.2f}", "Min": "{:,.2f}", "Max": "{:,.2f}", "Spread (%)": "{:.1f}"}
+    st.markdown("#### By model")
+    st.dataframe(metric_table(report.by_model, metric).style.format(number_format, na_rep="-"))
+    st.markdown("#### By access UI")
+    st.dataframe(metric_table(report.by_accessui, metric).style.format(number_format, na_rep="-"))
+
+@profiling.profiled('view.create_plots')
 def create_plots():
+    data = get_data()
     charcount_plot = create_bar_chart(data, 'Character Count')
     codepercent_plot = create_bar_chart(data, 'Code Percentage')
     codeblocks_plot = create_bar_chart(data, 'Code Blocks')
     return charcount_plot, codepercent_plot, codeblocks_plot
 
+# Interactive charts: only the data series is sent, the browser draws them
+@profiling.profiled('view.interactive_plots')
+def view_interactive_plots(group_by):
+    data = get_data()
+    split_by = 'Access UI' if group_by == 'Model' else 'Model'
+    for column in ('Character Count', 'Code Percentage', 'Code Blocks'):
+        st.vega_lite_chart(chart_series(data, column, group_by, split_by),
+                           vega_lite_bar_spec(column, group_by, split_by), width="stretch")
+
+def view_profile(run):
+    # Debug panel: where this rerun's time went and how often the caches hit
+    with st.sidebar.expander("Profiling", expanded=True):
+        st.caption(f"Rerun {run.id}: {run.duration * 1000:.1f} ms")
+        steps = profiling.run_steps(run)
+        st.dataframe({"Step": [name for name, _ in steps], "ms": [round(ms, 2) for _, ms in steps]},
+                     hide_index=True)
+        stats = profiling.cache_stats()
+        st.dataframe({"Cache": [stat[0] for stat in stats], "Hits": [stat[1] for stat in stats],
+                      "Misses": [stat[2] for stat in stats],
+                      "Hit rate": [None if stat[3] is None else round(stat[3] * 100, 1) for stat in stats],
+                      "Entries": [stat[4] for stat in stats]}, hide_index=True)
+
 # Streamlit app
 st.title("LLM Long Code Generation Output Experiment")
 
@@ -92,6 +222,8 @@ data_tab = st.sidebar.button("Data", use_container_width=True)
 visualizations_tab = st.sidebar.button("Visualizations", use_container_width=True)
 outputs_tab = st.sidebar.button("Outputs", use_container_width=True)
 prompt_tab = st.sidebar.button("Prompt", use_container_width=True)
+search_tab = st.sidebar.button("Search", use_container_width=True)
+similarity_tab = st.sidebar.button("Similarity", use_container_width=True)
 report_tab = st.sidebar.button("Report", use_container_width=True)
 
 # GitHub repository button
@@ -106,48 +238,51 @@ This experiment was conducted on the 10th of December 2024 by Daniel Rosehill.
 The purpose of this experiment was to compare different large language models' ability to generate a long continuous output in response to a large and demanding prompt.
 """)
 
-# Main content based on button clicks
-if data_tab:
+# Remember the selected view so that widgets inside it survive reruns
+for view_name, clicked in [("Data", data_tab), ("Visualizations", visualizations_tab), ("Outputs", outputs_tab),
+                           ("Prompt", prompt_tab), ("Search", search_tab), ("Similarity", similarity_tab),
+                           ("Report", report_tab)]:
+    if clicked:
+        st.session_state.view = view_name
+current_view = st.session_state.get('view', "Data")
+
+# Main content based on the selected view
+if current_view == "Data":
     st.header("Data Table")
     view_data()
-elif visualizations_tab:
+elif current_view == "Visualizations":
     st.header("Visualizations")
-    charcount_plot, codepercent_plot, codeblocks_plot = create_plots()
-    
-    st.image(charcount_plot, caption="Character Count")
-    st.image(codepercent_plot, caption="Code Percentage")
-    st.image(codeblocks_plot, caption="Code Blocks")
-elif outputs_tab:
+    chart_mode = st.radio("Chart mode", ["Interactive", "Static image"], horizontal=True)
+    if chart_mode == "Interactive":
+        group_by = st.radio("Group by", ["Model", "Access UI"], horizontal=True)
+        view_interactive_plots(group_by)
+    else:
+        charcount_plot, codepercent_plot, codeblocks_plot = create_plots()
+
+        st.image(charcount_plot, caption="Character Count")
+        st.image(codepercent_plot, caption="Code Percentage")
+        st.image(codeblocks_plot, caption="Code Blocks")
+elif current_view == "Outputs":
     st.header("Outputs")
     output_index = st.number_input("Output Index (0 to {})".format(len(output_files) - 1), min_value=0, max_value=len(output_files) - 1, value=0, step=1)
-    view_output(output_index)
-elif prompt_tab:
+    code_only = st.toggle("Code only")
+    view_output(output_index, code_only)
+elif current_view == "Prompt":
     st.header("Prompt")
     view_prompt()
-elif report_tab:
+elif current_view == "Search":
+    st.header("Search")
+    view_search()
+elif current_view == "Similarity":
+    st.header("Similarity")
+    view_similarity()
+elif current_view == "Report":
     st.header("Thoughts")
-    report_content = """
-The purpose of this experiment was to compare and evaluate the capability of different code generation large language models to generate a single long continuous output.
-
-The prompt used as well as all the outputs are recorded in the data folder. The demanding prompt requested that the LLM assist in the generation of a Open AI Whisper Speech to text transcription GUI for Linux.
-
-Various large language models were tested across different platforms, including models deployed on Hugging Face, those available via Open Router, and those hosted locally on LM Studio.
-
-The outputs were recorded in their original form in the outputs folder and a script was used to calculate the character count as well as the percentage of code in the outputs, which was calculated by computing the character count within code fences and comparing that to the total character count in the output.
-
-Additionally, the number of code blocks within each single output was computed by calculating the number of code blocks in the output.
-
-### Longest Generation: Qwen 2.5 Coder
-
-Qwen 2.5 Coder generated the longest single output at 13,950 characters, almost 90% of which constituted code spread across five different code blocks.
-
-Discrepancies between runs on the same platform, and when comparing the same model's output across different access interfaces, were overall quite small. Quen 2.5 when accessed via Open Router via its API yielded an output of 13,159 characters with a code percentage of 82%. This works out to a difference in output length of 5.7 %.
-
-Qwen's larger 72B parameter instruction model generated an output that was almost as long as that of its smaller code specific sibling, 2.5 Coder (12,921 characters, 84% within codefences).
-
-The lengthiest response among the "Western" models was the one generated by OpenAI's o-1 Preview, accessed via API, which generated 13,622 characters (82% within codefences) and the largest number of unique code blocks at 10.
-    """
-    st.markdown(report_content)
+    view_report()
 else:
     st.header("Data Table")
-    view_data()
\ No newline at end of file
+    view_data()
+
+profiling.finish_run(profiling_run)
+if profiling_run:
+    view_profile(profiling_run)
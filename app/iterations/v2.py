@@ -1,61 +1,27 @@
 import streamlit as st
-import pandas as pd
 import os
-import markdown2
-import matplotlib.pyplot as plt
-from PIL import Image
-import io
-
-# Load the data
-data_path = 'data/evaluations.csv'
-if not os.path.exists(data_path):
-    st.error(f"Data file not found: {data_path}")
-    st.stop()
-data = pd.read_csv(data_path)
-
-# Rename columns for better readability
-data.rename(columns={
-    'model': 'Model',
-    'accessUI': 'Access UI',
-    'codepercent': 'Code Percentage',
-    'codechars': 'Code Characters',
-    'charcount': 'Character Count',
-    'codeblocks': 'Code Blocks',
-    'output_number': 'Output Number'
-}, inplace=True)
-
-# Load the prompt
-prompt_path = 'data/prompts/prompt.md'
-if not os.path.exists(prompt_path):
-    st.error(f"Prompt file not found: {prompt_path}")
-    st.stop()
-with open(prompt_path, 'r') as file:
-    prompt_content = file.read()
+import sys
+
+# Make the shared longcodegen package importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-# Load outputs
-outputs_path = 'data/outputs'
-if not os.path.exists(outputs_path):
-    st.error(f"Outputs directory not found: {outputs_path}")
+from longcodegen.charts import bar_chart_png
+from longcodegen.corpus import Corpus
+
+# Load the data, the prompt and the outputs from app/data
+corpus = Corpus(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+missing = corpus.missing()
+if missing:
+    st.error(missing[0])
     st.stop()
-output_files = sorted([f for f in os.listdir(outputs_path) if f.endswith('.md')], key=lambda x: int(x.replace('output', '').replace('.md', '')))
+# Columns renamed for better readability
+data = corpus.evaluations(True)
+prompt_content = corpus.prompt()
+output_files = corpus.output_names()
 
-# Create visualizations
+# Create visualizations (PNG bytes, cached in memory and on disk by data hash)
 def create_bar_chart(data, column):
-    plt.figure(figsize=(10, 6))
-    data_sorted = data.sort_values(by=column, ascending=False)
-    plt.bar(data_sorted['Model'], data_sorted[column])
-    plt.xlabel('Model')
-    plt.ylabel(column)
-    plt.title(column)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    
-    # Convert plot to image
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    image = Image.open(buf)
-    return image
+    return bar_chart_png(data, column, 'Model')
 
 # Define the Streamlit interface
 def view_data():
@@ -68,9 +34,7 @@ def view_output(file_index):
     if file_index < 0 or file_index >= len(output_files):
         st.error("Invalid file index")
         return
-    with open(os.path.join(outputs_path, output_files[file_index]), 'r') as file:
-        output_content = file.read()
-    st.markdown(output_content)
+    st.markdown(corpus.read_output(file_index))
 
 def create_plots():
     charcount_plot = create_bar_chart(data, 'Character Count')
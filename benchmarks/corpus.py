@@ -0,0 +1,164 @@
+"""Synthetic corpus generator for the benchmarks.
+
+Writes outputN.md files that look like the real outputs: a "Model Via UI"
+heading, prose paragraphs and headings, and fenced code blocks, mostly
+Python that parses. The size of each file is drawn from a log-normal
+distribution around --mean-size, the share of blocks that are code from
+--fence-density, and a --malformed share of files get one broken fence
+(unclosed, closed by a shorter fence, a stray fence in a list item, ...).
+
+Every file is generated from its own seed, so a corpus is reproducible and
+can be written across a process pool:
+
+    python benchmarks/corpus.py /tmp/corpus-10k --files 10000 --mean-size 12000
+
+The parameters are stored in corpus.json inside the folder, and a folder
+that already holds a corpus generated with the same parameters is reused.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from multiprocessing import Pool
+
+MODELS = ['Qwen2.5 Coder 32B', 'o1 Preview', 'Gemini 1.5 Pro', 'DeepSeek', 'Claude 3.5 Sonnet', 'GPT-4o',
+          'Llama 3.3 70B', 'Codestral', 'Mistral Large', 'Phi-4']
+ACCESS_UIS = ['Hugging Face Chat', 'LibreChat', 'OpenWebUI', 'Online Playground', 'LM Studio', 'Open Router']
+LANGUAGES = ['python'] * 6 + ['bash', 'json', 'yaml', '']
+WORDS = ('the application uses a window for audio input and the whisper api to transcribe speech into text '
+         'we store the key securely with keyring and start recording on a global keyboard shortcut while '
+         'the transcription is inserted into the active text field of any program running on linux').split()
+MALFORMED = ['unclosed', 'short_close', 'list_item', 'stray_backticks', 'tilde_mismatch']
+
+# Defaults match the size of the real outputs
+DEFAULTS = {'mean_size': 12000, 'size_sigma': 0.6, 'fence_density': 0.45, 'malformed': 0.05, 'seed': 1}
+
+
+def prose(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.\n\n'
+
+
+def code_lines(rng, language, lines):
+    if language in ('python', ''):
+        body = []
+        while len(body) < lines:
+            n = rng.randrange(1000)
+            body += [f'def handler_{n}(event, value={n}):\n', f'    result = process(event, value * {n})\n',
+                     '    return result\n', '\n']
+        body[0:0] = ['import os\n', 'import sys\n', '\n']
+        return body[:max(lines, 3)]
+    if language == 'bash':
+        return [f'pip install package{rng.randrange(100)}\n' for _ in range(lines)]
+    if language == 'json':
+        return ['{\n'] + [f'  "key{i}": {rng.randrange(1000)},\n' for i in range(lines)] + ['  "end": true\n', '}\n']
+    return [f'key{i}: value{rng.randrange(1000)}\n' for i in range(lines)]
+
+
+def malformed_fence(rng, kind):
+    if kind == 'unclosed':
+        return '```python\nprint("never closed")\n'
+    if kind == 'short_close':
+        return '````markdown\n```python\nprint("nested")\n```\n'
+    if kind == 'list_item':
+        return '1. Install it:\n    ```bash\n    pip install pyqt5\n    ```\n\n'
+    if kind == 'stray_backticks':
+        return 'Wrap code in ``` fences, like ```this```.\n\n'
+    return '~~~~\ncode in a tilde fence\n```\nnot a close\n~~~\nstill code\n~~~~\n\n'
+
+
+def output_text(index, params):
+    """Markdown of output number index, determined by the seed and index alone."""
+    rng = random.Random(params['seed'] * 1_000_003 + index)
+    target = max(int(rng.lognormvariate(0, params['size_sigma']) * params['mean_size']), 200)
+    parts = [f"# {rng.choice(MODELS)} Via {rng.choice(ACCESS_UIS)}\n\n"]
+    size = len(parts[0])
+    broken = rng.choice(MALFORMED) if rng.random() < params['malformed'] else None
+    while size < target:
+        if rng.random() < params['fence_density']:
+            language = rng.choice(LANGUAGES)
+            part = f'```{language}\n' + ''.join(code_lines(rng, language, rng.randrange(5, 60))) + '```\n\n'
+        elif rng.random() < 0.2:
+            part = f"## Step {rng.randrange(1, 20)}: {prose(rng, 4).strip().rstrip('.')}\n\n"
+        else:
+            part = prose(rng, rng.randrange(20, 120))
+        parts.append(part)
+        size += len(part)
+    if broken:
+        # An unclosed fence swallows the rest of the file, so it goes last
+        position = len(parts) if broken == 'unclosed' else rng.randrange(1, len(parts) + 1)
+        parts.insert(position, malformed_fence(rng, broken))
+    return ''.join(parts)
+
+
+def _write_output(task):
+    folder, index, params = task
+    with open(os.path.join(folder, f'output{index}.md'), 'w', encoding='utf-8') as file:
+        file.write(output_text(index, params))
+
+
+def generate_corpus(folder, files, workers=None, chunksize=256, **params):
+    """Write a corpus of files outputs into folder; returns True if it was (re)generated.
+
+    params override DEFAULTS. A folder whose corpus.json records the same
+    file count and parameters is left as it is.
+    """
+    params = dict(DEFAULTS, **params)
+    description = dict(params, files=files)
+    description_path = os.path.join(folder, 'corpus.json')
+    outputs = os.path.join(folder, 'outputs')
+    if os.path.exists(description_path):
+        with open(description_path, 'r', encoding='utf-8') as file:
+            if json.load(file) == description:
+                return False
+    os.makedirs(outputs, exist_ok=True)
+    for name in os.listdir(outputs):
+        os.unlink(os.path.join(outputs, name))
+
+    tasks = ((outputs, index, params) for index in range(1, files + 1))
+    if workers == 1 or files <= 1:
+        for task in tasks:
+            _write_output(task)
+    else:
+        with Pool(processes=workers) as pool:
+            for _ in pool.imap_unordered(_write_output, tasks, chunksize=chunksize):
+                pass
+    with open(description_path, 'w', encoding='utf-8') as file:
+        json.dump(description, file, indent=1)
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus of model outputs for benchmarking.")
+    parser.add_argument('folder', help="Folder to write; the outputs go into <folder>/outputs")
+    parser.add_argument('--files', type=int, default=10000, help="Number of outputs (default: 10000)")
+    parser.add_argument('--mean-size', type=int, default=DEFAULTS['mean_size'],
+                        help=f"Median output size in characters (default: {DEFAULTS['mean_size']})")
+    parser.add_argument('--size-sigma', type=float, default=DEFAULTS['size_sigma'],
+                        help=f"Log-normal sigma of the output sizes (default: {DEFAULTS['size_sigma']})")
+    parser.add_argument('--fence-density', type=float, default=DEFAULTS['fence_density'],
+                        help=f"Share of blocks that are fenced code (default: {DEFAULTS['fence_density']})")
+    parser.add_argument('--malformed', type=float, default=DEFAULTS['malformed'],
+                        help=f"Share of outputs with a malformed fence (default: {DEFAULTS['malformed']})")
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count, 1 disables the pool)")
+    return parser.parse_args(argv)
+
+
+def corpus_params(args):
+    return {'mean_size': args.mean_size, 'size_sigma': args.size_sigma, 'fence_density': args.fence_density,
+            'malformed': args.malformed, 'seed': args.seed}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if generate_corpus(args.folder, args.files, workers=args.workers, **corpus_params(args)):
+        print(f"Generated {args.files} outputs in {os.path.join(args.folder, 'outputs')}")
+    else:
+        print(f"{args.folder} already holds this corpus")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
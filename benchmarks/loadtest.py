@@ -0,0 +1,216 @@
+"""Load test of the Gradio app with many simulated concurrent users.
+
+Each user opens the app's API in a loop and picks an action at random,
+weighted like a browsing session:
+
+    view_data                 a page of the data table
+    open_output               the first page of an output
+    search_outputs            a full-text search
+    create_interactive_plots  the chart series for a grouping
+
+and waits a think time between actions. Requests go through the Gradio
+queue the way the browser's do (POST /gradio_api/call/<name>, then the
+event stream of the result), so the app's concurrency limits and queue
+size apply:
+
+    python benchmarks/loadtest.py --users 200 --duration 60 --json load.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:7860 --users 50
+
+Without --url the app in alternates/gradio is started on a free port and
+stopped afterwards. Latency percentiles, throughput and errors are
+reported per action; with --max-p95 the run exits with status 1 if any
+action's p95 latency is above it or any request failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, repo_root)
+
+from benchmarks.suite import git_commit
+
+app_dir = os.path.join(repo_root, 'alternates', 'gradio')
+
+QUERIES = ['pyqt5', 'whisper', '"global shortcut"', 'keyring', 'audio', 'transcription api', 'def', 'import os']
+# action -> (weight, arguments for one call)
+ACTIONS = {
+    'view_data': (3, lambda rng, outputs: [rng.randint(1, 3), 50, '(file order)', True]),
+    'open_output': (4, lambda rng, outputs: [rng.randrange(outputs), False]),
+    'search_outputs': (2, lambda rng, outputs: [rng.choice(QUERIES), 'All', [], []]),
+    'create_interactive_plots': (1, lambda rng, outputs: [rng.choice(['Model', 'Access UI'])]),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client, url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"The app exited with status {process.returncode}")
+        try:
+            if (await client.get(url + '/gradio_api/info')).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"The app did not answer at {url} within {timeout}s")
+
+
+async def call(client, url, action, data):
+    """Submit one event through the queue and wait for its result; raises on errors."""
+    response = await client.post(f'{url}/gradio_api/call/{action}', json={'data': data})
+    response.raise_for_status()
+    event_id = response.json()['event_id']
+    event = None
+    async with client.stream('GET', f'{url}/gradio_api/call/{action}/{event_id}') as stream:
+        stream.raise_for_status()
+        async for line in stream.aiter_lines():
+            if line.startswith('event:'):
+                event = line[len('event:'):].strip()
+            elif line.startswith('data:') and event in ('complete', 'error'):
+                if event == 'error':
+                    raise RuntimeError(line[len('data:'):].strip() or "event failed")
+                return
+    raise RuntimeError("stream ended without a result")
+
+
+async def user(client, url, seed, stop_at, think, outputs, samples, errors):
+    rng = random.Random(seed)
+    names = list(ACTIONS)
+    weights = [ACTIONS[name][0] for name in names]
+    # Users arrive over the first second rather than all at once
+    await asyncio.sleep(rng.random())
+    while time.monotonic() < stop_at:
+        action = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            await call(client, url, action, ACTIONS[action][1](rng, outputs))
+            samples[action].append(time.perf_counter() - start)
+        except Exception as error:
+            errors[action].append(str(error)[:200] or type(error).__name__)
+        await asyncio.sleep(rng.uniform(0, 2 * think))
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else None
+
+
+def summarize(samples, errors, seconds):
+    results = []
+    for action in ACTIONS:
+        values = sorted(samples[action])
+        results.append({'action': action, 'requests': len(values), 'errors': len(errors[action]),
+                        'throughput': len(values) / seconds, 'p50_seconds': percentile(values, 0.5),
+                        'p95_seconds': percentile(values, 0.95), 'p99_seconds': percentile(values, 0.99),
+                        'max_seconds': values[-1] if values else None, 'error_samples': errors[action][:3]})
+    return results
+
+
+async def run(args):
+    import httpx
+
+    process = None
+    url = args.url.rstrip('/') if args.url else None
+    if url is None:
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, GRADIO_SERVER_PORT=str(port), GRADIO_ANALYTICS_ENABLED='False')
+        process = subprocess.Popen([sys.executable, 'app.py'], cwd=app_dir, env=env, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+    # Idle connections are dropped before the server's keep-alive timeout
+    # (5s in uvicorn), so a request never goes out on a socket being closed
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2,
+                          keepalive_expiry=2)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+            start = time.monotonic()
+            await wait_until_up(client, url, process, args.startup_timeout)
+            startup = time.monotonic() - start
+            print(f"App answering at {url} after {startup:.1f}s; {args.users} users for {args.duration}s",
+                  file=sys.stderr)
+
+            outputs = args.outputs
+            if outputs is None:
+                from longcodegen.corpus import Corpus
+
+                outputs = len(Corpus(os.path.join(app_dir, 'data')).output_names())
+            samples = {action: [] for action in ACTIONS}
+            errors = {action: [] for action in ACTIONS}
+            start = time.monotonic()
+            await asyncio.gather(*(user(client, url, args.seed + i, start + args.duration, args.think, outputs,
+                                        samples, errors) for i in range(args.users)))
+            seconds = time.monotonic() - start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    return summarize(samples, errors, seconds), seconds, startup
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent users of the Gradio app and report "
+                                                 "latency percentiles, throughput and errors per action.")
+    parser.add_argument('--url', help="Test a running app instead of starting alternates/gradio/app.py")
+    parser.add_argument('--users', type=int, default=200, help="Concurrent simulated users (default: 200)")
+    parser.add_argument('--duration', type=float, default=60, help="Seconds to run for (default: 60)")
+    parser.add_argument('--think', type=float, default=1.0,
+                        help="Mean seconds a user waits between actions (default: 1.0)")
+    parser.add_argument('--outputs', type=int, help="Number of outputs to pick from (default: read from the app's data)")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds before a request counts as failed")
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--max-p95', type=float, help="Fail if any action's p95 latency is above this many seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results, seconds, startup = asyncio.run(run(args))
+
+    def ms(value):
+        return f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'action':<26} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for result in results:
+        print(f"{result['action']:<26} {result['requests']:>8} {result['errors']:>6} {result['throughput']:7.1f} "
+              f"{ms(result['p50_seconds'])} {ms(result['p95_seconds'])} {ms(result['p99_seconds'])}")
+    total = sum(result['requests'] for result in results)
+    failed = sum(result['errors'] for result in results)
+    print(f"{total} requests in {seconds:.1f}s ({total / seconds:.1f}/s), {failed} errors")
+    for result in results:
+        for sample in result['error_samples']:
+            print(f"  {result['action']}: {sample}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'commit': git_commit(), 'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                       'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                       'url': args.url, 'users': args.users, 'duration': seconds, 'think': args.think,
+                       'startup_seconds': startup, 'results': results}, file, indent=2)
+
+    if args.max_p95 is not None:
+        slow = [result for result in results
+                if result['p95_seconds'] is not None and result['p95_seconds'] > args.max_p95]
+        for result in slow:
+            print(f"{result['action']} p95 {result['p95_seconds']:.3f}s is above {args.max_p95}s")
+        return 1 if slow or failed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
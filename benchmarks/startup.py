@@ -0,0 +1,152 @@
+"""Cold-start benchmark for the dashboards.
+
+Every view is measured in a fresh interpreter, so the numbers include the
+imports that view pulls in. For the Streamlit app that is the first run of
+the script with the view selected, followed by a warm rerun; for the Gradio
+app it is building the Blocks and then the first call of the view's handler.
+
+    python benchmarks/startup.py --repeat 3 --json startup.json --budget 5
+
+Exits with status 1 if any view's first render takes longer than --budget.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+streamlit_app = os.path.join(repo_root, 'app', 'app.py')
+gradio_dir = os.path.join(repo_root, 'alternates', 'gradio')
+
+STREAMLIT_VIEWS = ["Data", "Visualizations", "Outputs", "Prompt", "Report"]
+GRADIO_VIEWS = ["Data", "Visualizations", "Outputs"]
+HEAVY_MODULES = ['pandas', 'numpy', 'matplotlib', 'PIL', 'markdown2']
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def probe_streamlit(view):
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_s = time.perf_counter() - start
+
+    app = AppTest.from_file(streamlit_app, default_timeout=120)
+    app.session_state['view'] = view
+    start = time.perf_counter()
+    app.run()
+    first_render_s = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f"{view} view failed: {app.exception[0].message}")
+
+    start = time.perf_counter()
+    app.run()
+    rerender_s = time.perf_counter() - start
+    return {'import_s': import_s, 'first_render_s': first_render_s, 'rerender_s': rerender_s}
+
+
+def probe_gradio(view):
+    import runpy
+
+    start = time.perf_counter()
+    import gradio as gr
+    import_s = time.perf_counter() - start
+
+    gr.Blocks.launch = lambda self, *args, **kwargs: None
+    os.chdir(gradio_dir)
+    start = time.perf_counter()
+    app = runpy.run_path(os.path.join(gradio_dir, 'app.py'))
+    build_s = time.perf_counter() - start
+
+    # view_data is async, as the app's handlers that read files are
+    handlers = {
+        "Data": lambda: asyncio.run(app['view_data']()),
+        "Visualizations": lambda: app['create_interactive_plots']("Model"),
+        "Outputs": lambda: app['view_output'](0),
+    }
+    start = time.perf_counter()
+    handlers[view]()
+    first_render_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    handlers[view]()
+    rerender_s = time.perf_counter() - start
+    # The static chart images are rendered in a daemon thread at startup; let
+    # it finish so the interpreter doesn't exit under it
+    app['chart_thread'].join()
+    return {'import_s': import_s, 'build_s': build_s, 'first_render_s': first_render_s, 'rerender_s': rerender_s}
+
+
+def run_probe(app, view, warm_cache):
+    """Measure one view in a fresh interpreter and return its timings."""
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as cache:
+        if not warm_cache:
+            env['LONGCODEGEN_CACHE_DIR'] = cache
+        completed = subprocess.run([sys.executable, __file__, '--probe', app, view],
+                                   capture_output=True, text=True, env=env, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{app} {view} probe failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    summary = {key: statistics.median(sample[key] for sample in samples)
+               for key in samples[0] if key.endswith('_s')}
+    summary['modules'] = samples[0]['modules']
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import and first-render time per dashboard view.")
+    parser.add_argument('--app', choices=['streamlit', 'gradio', 'all'], default='all')
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh processes per view; the median is reported")
+    parser.add_argument('--warm-cache', action='store_true', help="Reuse the on-disk chart cache instead of an empty one")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--budget', type=float, help="Fail if a view's first render takes longer (seconds)")
+    parser.add_argument('--probe', nargs=2, metavar=('APP', 'VIEW'), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.probe:
+        app, view = args.probe
+        timings = probe_streamlit(view) if app == 'streamlit' else probe_gradio(view)
+        timings['modules'] = loaded_heavy_modules()
+        print(json.dumps(timings))
+        return 0
+
+    apps = ['streamlit', 'gradio'] if args.app == 'all' else [args.app]
+    results = []
+    for app in apps:
+        for view in STREAMLIT_VIEWS if app == 'streamlit' else GRADIO_VIEWS:
+            samples = [run_probe(app, view, args.warm_cache) for _ in range(args.repeat)]
+            results.append(dict(app=app, view=view, **summarize(samples)))
+
+    print(f"{'app':<10} {'view':<15} {'import':>8} {'build':>8} {'first':>8} {'rerun':>8}  modules")
+    for result in results:
+        build = f"{result['build_s']:8.3f}" if 'build_s' in result else f"{'-':>8}"
+        print(f"{result['app']:<10} {result['view']:<15} {result['import_s']:8.3f} {build} "
+              f"{result['first_render_s']:8.3f} {result['rerender_s']:8.3f}  {', '.join(result['modules'])}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}, file, indent=2)
+
+    if args.budget is not None:
+        slow = [result for result in results if result['first_render_s'] > args.budget]
+        for result in slow:
+            print(f"{result['app']} {result['view']} first render {result['first_render_s']:.3f}s exceeds {args.budget}s")
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Throughput benchmarks over synthetic corpora of increasing size.
+
+For every scale a corpus is generated with benchmarks/corpus.py (and reused
+on later runs), then these are timed:
+
+    score         calculator.py scoring the whole corpus, in a subprocess
+    csv_load      load_evaluations() of the scored CSV, uncached
+    create_plots  the three bar charts of the dashboards' create_plots(),
+                  with an empty chart cache and then a warm one
+    view_output   the first page of an output as the viewers render it
+                  (section index, section reads, the HTML cache), over a
+                  sample, with an empty cache and then a warm one
+
+    python benchmarks/suite.py --scales 10 10000 1000000 --json bench.json
+    python benchmarks/suite.py --scales 10 10000 --json new.json --compare bench.json
+
+Results are written as JSON together with the commit, Python version and
+CPU count. With --compare, every timing is checked against an earlier
+results file and the run exits with status 1 if any got slower by more
+than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, repo_root)
+
+from benchmarks.corpus import DEFAULTS, corpus_params, generate_corpus
+
+calculator = os.path.join(repo_root, 'working', 'scripts', 'calculator.py')
+
+BENCHMARKS = ['score', 'csv_load', 'create_plots', 'view_output']
+CHART_COLUMNS = ['Character Count', 'Code Percentage', 'Code Blocks']
+# Timings this short are mostly noise, so they are never reported as regressions
+NOISE_FLOOR_S = 0.005
+
+
+def timed(func, repeat=1):
+    """Median wall time of func() over repeat calls, and its last result."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def bench_score(outputs, csv_path, workers):
+    command = [sys.executable, calculator, outputs, '-o', csv_path]
+    if workers:
+        command += ['-j', str(workers)]
+    seconds, completed = timed(lambda: subprocess.run(command, capture_output=True, text=True, check=False))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scoring failed:\n{completed.stderr}")
+    return seconds
+
+
+def bench_csv_load(csv_path, repeat):
+    from longcodegen.data import load_evaluations
+
+    # The unwrapped loader skips the file-version cache
+    seconds, data = timed(lambda: load_evaluations.__wrapped__(csv_path), repeat)
+    return {'seconds': seconds, 'rows': len(data), 'memory_mb': data.memory_usage(deep=True).sum() / 1e6}
+
+
+def bench_create_plots(csv_path, repeat):
+    from longcodegen import charts
+    from longcodegen.data import load_evaluations
+
+    data = load_evaluations(csv_path, True)
+
+    def create_plots():
+        return [charts.bar_chart_png(data, column, 'Model') for column in CHART_COLUMNS]
+
+    with tempfile.TemporaryDirectory() as cache:
+        os.environ['LONGCODEGEN_CACHE_DIR'] = cache
+        try:
+            def cold():
+                charts._memory_cache.clear()
+                for name in os.listdir(charts.cache_dir()) if os.path.isdir(charts.cache_dir()) else []:
+                    os.unlink(os.path.join(charts.cache_dir(), name))
+                return create_plots()
+
+            cold_s, _ = timed(cold, repeat)
+            warm_s, _ = timed(create_plots, repeat)
+        finally:
+            del os.environ['LONGCODEGEN_CACHE_DIR']
+    return {'seconds': cold_s, 'warm_seconds': warm_s}
+
+
+def render_first_page(cache, path):
+    from longcodegen.sections import load_sections, page_of_sections
+
+    sections = load_sections(path)
+    shown = page_of_sections(sections, 0) if sections else []
+    return cache.render_sections(path, [sections[index] for index in shown])
+
+
+def bench_view_output(outputs, sample, repeat):
+    from longcodegen.data import load_output_files
+    from longcodegen.htmlcache import HTMLCache
+
+    names = load_output_files(outputs)
+    step = max(len(names) // sample, 1)
+    chosen = [os.path.join(outputs, name) for name in names[::step][:sample]]
+    with tempfile.TemporaryDirectory() as folder:
+        # Imports markdown2 and Pygments outside of the timings
+        render_first_page(HTMLCache(os.path.join(folder, 'warmup.sqlite')), chosen[0])
+        cache = HTMLCache(os.path.join(folder, 'html-cache.sqlite'))
+        # Cold: every section missing, rendered and stored; warm: served from the cache
+        cold = sorted(timed(lambda path=path: render_first_page(cache, path))[0] for path in chosen)
+        warm = sorted(timed(lambda path=path: render_first_page(cache, path), repeat)[0] for path in chosen)
+    return {'seconds': statistics.median(cold), 'p95_seconds': cold[int(len(cold) * 0.95)],
+            'max_seconds': cold[-1], 'warm_seconds': statistics.median(warm),
+            'warm_p95_seconds': warm[int(len(warm) * 0.95)], 'outputs': len(cold)}
+
+
+def run_scale(files, args):
+    folder = os.path.join(args.work_dir, f'corpus-{files}')
+    start = time.perf_counter()
+    generated = generate_corpus(folder, files, workers=args.workers, **corpus_params(args))
+    print(f"{files} outputs: corpus {'generated' if generated else 'reused'} in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+    outputs = os.path.join(folder, 'outputs')
+    csv_path = os.path.join(folder, 'evaluations.csv')
+
+    results = []
+
+    def record(benchmark, measured):
+        measured = measured if isinstance(measured, dict) else {'seconds': measured}
+        results.append(dict(scale=files, benchmark=benchmark, **measured))
+        print(f"{files} outputs: {benchmark} {measured['seconds']:.4f}s", file=sys.stderr)
+
+    if 'score' in args.benchmarks or generated or not os.path.exists(csv_path):
+        seconds = bench_score(outputs, csv_path, args.workers)
+        if 'score' in args.benchmarks:
+            record('score', {'seconds': seconds, 'per_output_ms': seconds / files * 1000})
+    if 'csv_load' in args.benchmarks:
+        record('csv_load', bench_csv_load(csv_path, args.repeat))
+    if 'create_plots' in args.benchmarks:
+        record('create_plots', bench_create_plots(csv_path, args.repeat))
+    if 'view_output' in args.benchmarks:
+        record('view_output', bench_view_output(outputs, args.sample, args.repeat))
+    return results
+
+
+def git_commit():
+    completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_root, capture_output=True,
+                               text=True, check=False)
+    return completed.stdout.strip() or None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print current against baseline timings; returns the regressions."""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    before = {(result['scale'], result['benchmark']): result['seconds'] for result in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or baseline_path}:")
+    for result in results:
+        old = before.get((result['scale'], result['benchmark']))
+        if old is None:
+            continue
+        ratio = result['seconds'] / old if old else float('inf')
+        slower = result['seconds'] > old * (1 + tolerance) and result['seconds'] - old > NOISE_FLOOR_S
+        print(f"{result['scale']:>9} {result['benchmark']:<14} {old:10.4f} {result['seconds']:10.4f} {ratio:7.2f}x"
+              + ("  SLOWER" if slower else ""))
+        if slower:
+            regressions.append(result)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time scoring, CSV loading, chart rendering and output rendering "
+                                                 "on synthetic corpora.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 10_000, 1_000_000],
+                        help="Corpus sizes to run, in outputs (default: 10 10000 1000000)")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'longcodegen-bench'),
+                        help="Where corpora are generated and kept between runs")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of the in-process timings; the median is reported")
+    parser.add_argument('--sample', type=int, default=50, help="Outputs rendered by view_output (default: 50)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="Worker processes for generating and scoring (default: CPU count)")
+    parser.add_argument('--mean-size', type=int, default=DEFAULTS['mean_size'])
+    parser.add_argument('--size-sigma', type=float, default=DEFAULTS['size_sigma'])
+    parser.add_argument('--fence-density', type=float, default=DEFAULTS['fence_density'])
+    parser.add_argument('--malformed', type=float, default=DEFAULTS['malformed'])
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="Results file of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown against --compare before failing (default: 0.2, i.e. 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for files in args.scales:
+        results.extend(run_scale(files, args))
+
+    print(f"{'outputs':>9} {'benchmark':<14} {'seconds':>10}")
+    for result in results:
+        print(f"{result['scale']:>9} {result['benchmark']:<14} {result['seconds']:10.4f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'commit': git_commit(), 'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                       'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                       'workers': args.workers, 'corpus': corpus_params(args), 'results': results}, file, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for result in regressions:
+            print(f"{result['scale']} outputs {result['benchmark']} is more than {args.tolerance:.0%} slower")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Shared helpers for scoring and browsing the long code generation outputs."""
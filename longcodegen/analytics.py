@@ -0,0 +1,115 @@
+"""Aggregate statistics over the evaluations table for the Report view.
+
+Runs are grouped by model and by access UI and summarised with vectorized
+group-bys. The results are cached per version of evaluations.csv, so they
+are computed once after each ingest and come back immediately afterwards.
+"""
+from dataclasses import dataclass
+
+from longcodegen.cache import memoize_file
+from longcodegen.data import DISPLAY_COLUMNS, load_evaluations
+from longcodegen.profiling import profiled
+
+METRIC_COLUMNS = ['charcount', 'codechars', 'codepercent', 'codeblocks']
+STATISTICS = ['count', 'mean', 'var', 'min', 'max']
+
+# How the experiment was run, shown above the computed findings
+METHODOLOGY = """
+The purpose of this experiment was to compare and evaluate the capability of different code generation large language models to generate a single long continuous output.
+
+The prompt used as well as all the outputs are recorded in the data folder. The demanding prompt requested that the LLM assist in the generation of a Open AI Whisper Speech to text transcription GUI for Linux.
+
+Various large language models were tested across different platforms, including models deployed on Hugging Face, those available via Open Router, and those hosted locally on LM Studio.
+
+The outputs were recorded in their original form in the outputs folder and a script was used to calculate the character count as well as the percentage of code in the outputs, which was calculated by computing the character count within code fences and comparing that to the total character count in the output.
+
+Additionally, the number of code blocks within each single output was computed by calculating the number of code blocks in the output.
+"""
+
+
+@dataclass
+class Report:
+    runs: int
+    by_model: object  # DataFrame indexed by model
+    by_accessui: object  # DataFrame indexed by access UI
+    longest: dict  # Row of the longest output
+    most_code_blocks: dict
+    highest_code_percent: dict
+    widest_spread: dict  # Model whose repeated runs differ most in length, if any
+
+
+def summarize(data, by):
+    """count, mean, variance, min and max of every metric per group, plus the relative spread.
+
+    The spread is (max - min) / max of each metric, in percent: how much
+    shorter the smallest run of a group is than its largest. It is 0 for
+    groups with a single run.
+    """
+    import numpy as np
+
+    metrics = data[METRIC_COLUMNS].astype('float64')
+    summary = metrics.groupby(data[by], observed=True).agg(STATISTICS)
+    for column in METRIC_COLUMNS:
+        high, low = summary[(column, 'max')], summary[(column, 'min')]
+        summary[(column, 'spread')] = np.where(high > 0, (high - low) / high.where(high > 0) * 100, 0.0)
+    summary = summary.reindex(columns=[(column, stat) for column in METRIC_COLUMNS
+                                       for stat in STATISTICS + ['spread']])
+    return summary.sort_values((METRIC_COLUMNS[0], 'mean'), ascending=False)
+
+
+def _row(data, column):
+    """Row with the largest value of column, as a dict."""
+    return data.iloc[int(data[column].to_numpy().argmax())].to_dict()
+
+
+@memoize_file(maxsize=4)
+@profiled('analytics.build_report')
+def build_report(path):
+    """Report for the evaluations table at path, cached until the file changes."""
+    data = load_evaluations(path)
+    by_model = summarize(data, 'model')
+    by_accessui = summarize(data, 'accessui')
+
+    repeated = by_model[by_model[('charcount', 'count')] > 1]
+    widest_spread = None
+    if len(repeated):
+        model = repeated[('charcount', 'spread')].idxmax()
+        widest_spread = {'model': model, 'runs': int(repeated.loc[model, ('charcount', 'count')]),
+                         'spread': float(repeated.loc[model, ('charcount', 'spread')]),
+                         'min': int(repeated.loc[model, ('charcount', 'min')]),
+                         'max': int(repeated.loc[model, ('charcount', 'max')])}
+    return Report(
+        runs=len(data),
+        by_model=by_model,
+        by_accessui=by_accessui,
+        longest=_row(data, 'charcount'),
+        most_code_blocks=_row(data, 'codeblocks'),
+        highest_code_percent=_row(data, 'codepercent'),
+        widest_spread=widest_spread,
+    )
+
+
+def describe_run(row):
+    return (f"**{row['model']}** via {row['accessui']}: {row['charcount']:,} characters, "
+            f"{row['codepercent']:.1f}% within code fences, {row['codeblocks']} code blocks")
+
+
+def findings(report):
+    """The report's headline findings as Markdown list items."""
+    items = [f"Longest generation: {describe_run(report.longest)}",
+             f"Most code blocks: {describe_run(report.most_code_blocks)}",
+             f"Highest share of code: {describe_run(report.highest_code_percent)}"]
+    if report.widest_spread:
+        spread = report.widest_spread
+        items.append(f"Largest difference between runs of the same model: **{spread['model']}**, "
+                     f"{spread['min']:,} to {spread['max']:,} characters over {spread['runs']} runs "
+                     f"({spread['spread']:.1f}% shorter at the low end)")
+    return "\n".join(f"- {item}" for item in items)
+
+
+def metric_table(summary, column):
+    """The statistics of one metric from summary, with readable names, highest mean first."""
+    table = summary[column].rename(columns={'count': 'Runs', 'mean': 'Mean', 'var': 'Variance', 'min': 'Min',
+                                            'max': 'Max', 'spread': 'Spread (%)'})
+    table.index.name = DISPLAY_COLUMNS.get(table.index.name, table.index.name)
+    return table.sort_values('Mean', ascending=False)
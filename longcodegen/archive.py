@@ -0,0 +1,156 @@
+"""Packed archive of outputs: one file, compressed entries, random access.
+
+Layout:
+
+    MAGIC
+    entry data, each compressed on its own with zlib
+    index: zlib-compressed JSON holding one
+           [name, offset, compressed length, size, mtime_ns, crc32] per entry
+    trailer: index offset, index length (little-endian uint64), MAGIC
+
+Opening an archive reads the trailer and the index once; reading an output
+after that is a single seek and read of its compressed bytes, whatever the
+size of the archive. A corpus of hundreds of thousands of outputs becomes
+one file instead of one inode per output, and compresses to a fraction of
+its size.
+
+Archive members can be addressed like files inside a folder, e.g.
+data/outputs.lcgpack/output3.md; see split_member().
+"""
+import json
+import os
+import struct
+import zlib
+from collections import namedtuple
+from multiprocessing import Pool
+
+from longcodegen.cache import LRUCache, memoize_file
+from longcodegen.manifest import atomic_write
+from longcodegen.metrics import list_outputs, natural_key
+from longcodegen.profiling import profiled
+
+MAGIC = b'LCGPACK\x01'
+EXTENSION = '.lcgpack'
+ARCHIVE_VERSION = 1
+_TRAILER = struct.Struct('<QQ8s')
+
+Entry = namedtuple('Entry', 'name offset length size mtime_ns crc32')
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def is_archive(path):
+    return path.endswith(EXTENSION) and os.path.isfile(path)
+
+
+def split_member(path):
+    """(archive, name) if path points inside an archive, else None."""
+    archive, name = os.path.split(path)
+    return (archive, name) if is_archive(archive) else None
+
+
+class PackedArchive:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ArchiveError(f"Not an output archive: {path}")
+            file.seek(-_TRAILER.size, os.SEEK_END)
+            index_offset, index_length, magic = _TRAILER.unpack(file.read(_TRAILER.size))
+            if magic != MAGIC:
+                raise ArchiveError(f"Truncated output archive: {path}")
+            file.seek(index_offset)
+            index = json.loads(zlib.decompress(file.read(index_length)))
+        if index.get('version') != ARCHIVE_VERSION:
+            raise ArchiveError(f"Unsupported archive version {index.get('version')} in {path}")
+        self.entries = {entry[0]: Entry(*entry) for entry in index['entries']}
+        self._names = sorted(self.entries, key=natural_key)
+        self._recent = LRUCache(maxsize=8)
+
+    def names(self):
+        """Member names in natural order (output2 before output10)."""
+        return list(self._names)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read_bytes(self, name):
+        data = self._recent.get(name)
+        if data is not None:
+            return data
+        entry = self.entries.get(name)
+        if entry is None:
+            raise KeyError(name)
+        with open(self.path, 'rb') as file:
+            file.seek(entry.offset)
+            data = zlib.decompress(file.read(entry.length))
+        if zlib.crc32(data) != entry.crc32:
+            raise ArchiveError(f"Corrupt entry {name} in {self.path}")
+        # Viewers read several sections of the same output in a row
+        self._recent.put(name, data)
+        return data
+
+    def read_text(self, name):
+        return self.read_bytes(name).decode('utf-8', errors='replace')
+
+
+@memoize_file(maxsize=8)
+@profiled('archive.open_archive')
+def open_archive(path):
+    """PackedArchive at path, cached until the archive file is replaced."""
+    return PackedArchive(path)
+
+
+def read_member(path):
+    """Text of an output given as a file path or an archive member path."""
+    member = split_member(path)
+    if member:
+        return open_archive(member[0]).read_text(member[1])
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        return file.read()
+
+
+def _compress(task):
+    path, level = task
+    with open(path, 'rb') as file:
+        data = file.read()
+    return zlib.compress(data, level), len(data), zlib.crc32(data)
+
+
+def pack_folder(folder, path, level=6, workers=1, chunksize=64):
+    """Pack the outputs in folder into an archive at path; returns the entry count.
+
+    Entries are compressed in a process pool when workers > 1 and written
+    in order, so memory use doesn't grow with the corpus.
+    """
+    names = list_outputs(folder)
+    tasks = [(os.path.join(folder, name), level) for name in names]
+
+    def write_entries(file, compressed):
+        file.write(MAGIC)
+        offset = len(MAGIC)
+        entries = []
+        for name, (data, size, crc32) in zip(names, compressed):
+            file.write(data)
+            mtime_ns = os.stat(os.path.join(folder, name)).st_mtime_ns
+            entries.append([name, offset, len(data), size, mtime_ns, crc32])
+            offset += len(data)
+        index = zlib.compress(json.dumps({'version': ARCHIVE_VERSION, 'entries': entries},
+                                         separators=(',', ':')).encode('utf-8'))
+        file.write(index)
+        file.write(_TRAILER.pack(offset, len(index), MAGIC))
+
+    def write(file):
+        if workers == 1 or len(tasks) <= 1:
+            write_entries(file, map(_compress, tasks))
+            return
+        with Pool(processes=workers) as pool:
+            write_entries(file, pool.imap(_compress, tasks, chunksize=chunksize))
+
+    atomic_write(path, write, binary=True)
+    return len(names)
@@ -0,0 +1,100 @@
+"""Small in-process caches shared by the dashboards.
+
+Streamlit re-executes the app script on every interaction, but imported
+modules stay loaded, so caches that live here survive reruns and are shared
+by every session in the process.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry.
+
+    Entries can carry a version; a lookup with a different version counts
+    as a miss, so callers can invalidate by passing the current version.
+    Caches given a name are listed by named_caches(), which is where the
+    profiling panel reads hit rates from.
+    """
+
+    def __init__(self, maxsize=128, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            _named_caches[name] = self
+
+    def get(self, key, default=None, version=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            self._data[key] = (version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_MISSING = object()
+_named_caches = {}
+
+
+def named_caches():
+    """{name: LRUCache} of every cache created with a name, sorted by name."""
+    return dict(sorted(_named_caches.items()))
+
+
+def file_version(path):
+    """Cheap change marker for a file or directory: (mtime_ns, size).
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed, which is all a listing cache needs to know.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def memoize_file(maxsize=32):
+    """Memoize func(path, *args) until the file at path changes.
+
+    Only the newest version of each (path, args) is kept, so a file that is
+    rewritten replaces its old entry instead of waiting for eviction.
+    """
+    def decorator(func):
+        cache = LRUCache(maxsize, name=f'{func.__module__}.{func.__name__}'.replace('longcodegen.', ''))
+
+        @functools.wraps(func)
+        def wrapper(path, *args):
+            key = (os.path.abspath(path),) + args
+            version = file_version(path)
+            value = cache.get(key, _MISSING, version)
+            if value is _MISSING:
+                value = func(path, *args)
+                cache.put(key, value, version)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
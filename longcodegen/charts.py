@@ -0,0 +1,150 @@
+"""Bar chart rendering with an in-memory and on-disk PNG cache.
+
+Charts are drawn on a standalone Agg figure rather than through pyplot, so no
+global figure is left open after rendering. matplotlib is only imported when
+a chart actually has to be drawn. The PNG bytes are cached under a
+hash of the plotted data, first in memory and then on disk, so repeat views
+and restarted processes skip rendering entirely.
+"""
+import hashlib
+import io
+import os
+import tempfile
+
+from longcodegen.cache import LRUCache
+from longcodegen.profiling import profiled
+
+# Bump when the chart layout changes so stale images on disk are not reused
+CHART_VERSION = 1
+
+_memory_cache = LRUCache(maxsize=32, name='charts.png')
+
+
+def cache_dir():
+    """Directory for cached chart images ($LONGCODEGEN_CACHE_DIR or ~/.cache/longcodegen)."""
+    base = os.environ.get('LONGCODEGEN_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'longcodegen')
+    return os.path.join(base, 'charts')
+
+
+def chart_key(data, column, label_column):
+    """Hash of everything that affects the image: the plotted columns and the layout version."""
+    import pandas as pd
+
+    digest = hashlib.sha256(f'{CHART_VERSION}\0{label_column}\0{column}\0'.encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data[[label_column, column]], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+@profiled('charts.render_bar_chart')
+def render_bar_chart(data, column, label_column):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    data_sorted = data.sort_values(by=column, ascending=False)
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.bar(data_sorted[label_column], data_sorted[column])
+    axes.set_xlabel('Model')
+    axes.set_ylabel(column)
+    axes.set_title(column)
+    for label in axes.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    figure.tight_layout()
+
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def _write_png(path, png):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as file:
+        file.write(png)
+    os.replace(tmp_path, path)
+
+
+def bar_chart_file(data, column, label_column='Model'):
+    """Path of the cached PNG for a bar chart of column, rendering it if needed."""
+    key = chart_key(data, column, label_column)
+    png = bar_chart_png(data, column, label_column, key=key)
+    path = os.path.join(cache_dir(), key + '.png')
+    if not os.path.exists(path):
+        _write_png(path, png)
+    return path
+
+
+@profiled('charts.bar_chart_png')
+def bar_chart_png(data, column, label_column='Model', key=None):
+    """PNG bytes of a bar chart of column, sorted descending, one bar per label."""
+    key = key or chart_key(data, column, label_column)
+    png = _memory_cache.get(key)
+    if png is not None:
+        return png
+
+    path = os.path.join(cache_dir(), key + '.png')
+    try:
+        with open(path, 'rb') as file:
+            png = file.read()
+    except OSError:
+        png = render_bar_chart(data, column, label_column)
+        try:
+            _write_png(path, png)
+        except OSError:
+            pass  # A read-only cache directory only costs a re-render next time
+    _memory_cache.put(key, png)
+    return png
+
+
+def chart_series(data, column, label_column='Model', group_column='Access UI'):
+    """The three columns a client-side chart needs, largest values first.
+
+    This is all that gets sent to the browser, so the payload grows with the
+    number of rows rather than with image size.
+    """
+    series = data[[label_column, group_column, column]].sort_values(by=column, ascending=False)
+    return series.reset_index(drop=True)
+
+
+def vega_lite_bar_spec(column, label_column='Model', group_column='Access UI', title=None):
+    """Vega-Lite spec for a grouped bar chart rendered in the browser.
+
+    Bars are grouped along label_column and split by group_column; repeated
+    runs with the same label and group are averaged. Clicking a legend entry
+    highlights that group. title defaults to the column name.
+    """
+    title = title or column
+    return {
+        'title': title,
+        'mark': {'type': 'bar', 'tooltip': True},
+        'params': [{'name': 'group', 'select': {'type': 'point', 'fields': [group_column]}, 'bind': 'legend'}],
+        'encoding': {
+            'x': {'field': label_column, 'type': 'nominal', 'sort': '-y', 'axis': {'labelAngle': -45}},
+            'y': {'field': column, 'type': 'quantitative', 'aggregate': 'mean', 'title': title},
+            'xOffset': {'field': group_column, 'type': 'nominal'},
+            'color': {'field': group_column, 'type': 'nominal'},
+            'opacity': {'condition': {'param': 'group', 'value': 1}, 'value': 0.3},
+        },
+    }
+
+
+def similarity_series(matrix):
+    """A square similarity DataFrame in the long form a heatmap spec expects."""
+    return matrix.rename_axis(index='First').reset_index().melt(id_vars='First', var_name='Second',
+                                                                 value_name='Similarity')
+
+
+def vega_lite_heatmap_spec(title):
+    """Vega-Lite spec for a similarity heatmap of similarity_series() data."""
+    return {
+        'title': title,
+        'mark': {'type': 'rect', 'tooltip': True},
+        'encoding': {
+            'x': {'field': 'Second', 'type': 'nominal', 'sort': None, 'axis': {'labelAngle': -45}, 'title': None},
+            'y': {'field': 'First', 'type': 'nominal', 'sort': None, 'title': None},
+            'color': {'field': 'Similarity', 'type': 'quantitative', 'scale': {'domain': [0, 1], 'scheme': 'blues'}},
+        },
+    }
@@ -0,0 +1,187 @@
+"""Byte-offset index of the fenced code blocks in a folder or archive of outputs.
+
+Ingest records, for every output, the byte range of each code block's body
+(without its fence lines), its language tag and its line count. The index is
+a small JSON file next to the outputs, e.g. data/outputs.codeblocks.json
+for data/outputs. Readers map an output with mmap and copy out only the
+blocks they ask for, so showing the code of a generation, or collecting all
+blocks of one language across the corpus, never re-parses or reads whole
+files. Archive members are decompressed whole (and kept by the archive's
+small cache of recent entries) and sliced the same way.
+"""
+import json
+import mmap
+import os
+import threading
+from dataclasses import dataclass
+
+from longcodegen.cache import file_version
+from longcodegen.fences import FenceScanner
+from longcodegen.manifest import atomic_write
+from longcodegen.profiling import profiled
+from longcodegen.storage import locate, open_storage
+
+INDEX_VERSION = 1
+
+
+@dataclass
+class BlockRef:
+    language: str
+    start: int
+    end: int
+    lines: int
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+
+def index_path(folder):
+    """Where the code block index of a folder or archive lives."""
+    return os.path.normpath(folder) + '.codeblocks.json'
+
+
+def scan_blocks(path):
+    """BlockRefs of every code block in an output, in file order."""
+    scanner = FenceScanner()
+    blocks = []
+    offset = 0
+    storage, name = locate(path)
+    with storage.open(name) as file:
+        for raw in file:
+            kind = scanner.feed(raw.decode('utf-8', errors='replace'))
+            if kind == 'open':
+                blocks.append(BlockRef(scanner.open_block.language, offset + len(raw), offset + len(raw), 0))
+            elif kind == 'code':
+                blocks[-1].end = offset + len(raw)
+                blocks[-1].lines += 1
+            offset += len(raw)
+    return blocks
+
+
+class CodeBlockIndex:
+    def __init__(self, path, folder=None):
+        self.path = path
+        # With the folder (or archive) known, blocks() checks each output
+        # against its entry, so one rewritten in place is re-scanned
+        self.folder = folder
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            if content.get('version') == INDEX_VERSION:
+                self.entries = content['files']
+
+    def update(self, folder):
+        """Re-scan new or changed outputs in folder (or archive) and forget deleted ones.
+
+        Returns (updated, removed) counts; the index is only written when
+        something changed.
+        """
+        storage = open_storage(folder)
+        names = storage.names()
+        updated = 0
+        for name in names:
+            if self._rescan(storage, name):
+                updated += 1
+        removed = set(self.entries) - set(names)
+        for name in removed:
+            del self.entries[name]
+        if updated or removed:
+            self.save()
+        return updated, len(removed)
+
+    def _rescan(self, storage, name):
+        """Scan one output again if it changed since its entry was made; returns whether it did."""
+        stat = storage.stat(name)
+        entry = self.entries.get(name)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return False
+        blocks = scan_blocks(storage.path_of(name))
+        self.entries[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                              'blocks': [[block.language, block.start, block.end, block.lines]
+                                         for block in blocks]}
+        return True
+
+    def save(self):
+        content = {'version': INDEX_VERSION, 'files': self.entries}
+        atomic_write(self.path, lambda file: json.dump(content, file, separators=(',', ':')))
+
+    def blocks(self, name):
+        """BlockRefs of one output, by file name.
+
+        Rewriting an output in place doesn't always change its folder's
+        mtime, so the output's own size and mtime are checked here and its
+        entry is rebuilt when they differ.
+        """
+        if self.folder is not None:
+            with self._lock:
+                try:
+                    if self._rescan(open_storage(self.folder), name):
+                        self.save()
+                except FileNotFoundError:
+                    self.entries.pop(name, None)
+        entry = self.entries.get(name)
+        return [BlockRef(*block) for block in entry['blocks']] if entry else []
+
+    def languages(self):
+        """{language: (blocks, lines, bytes)} over every indexed output."""
+        totals = {}
+        for entry in self.entries.values():
+            for language, start, end, lines in entry['blocks']:
+                blocks, line_total, size = totals.get(language, (0, 0, 0))
+                totals[language] = (blocks + 1, line_total + lines, size + end - start)
+        return totals
+
+
+@profiled('codeblocks.read_blocks')
+def read_blocks(path, blocks):
+    """Text of each block of one output, copied out of a memory map of the file."""
+    if not blocks:
+        return []
+    storage, name = locate(path)
+    if storage.packed:
+        data = storage.read_bytes(name)
+        return [data[block.start:block.end].decode('utf-8', errors='replace').replace('\r\n', '\n')
+                for block in blocks]
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return ['' for _ in blocks]
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return [mapped[block.start:block.end].decode('utf-8', errors='replace').replace('\r\n', '\n')
+                    for block in blocks]
+
+
+def read_block(path, block):
+    return read_blocks(path, [block])[0]
+
+
+def blocks_of_language(index, folder, language):
+    """(file name, BlockRef, text) of every block tagged language, across all outputs."""
+    found = []
+    storage = open_storage(folder)
+    for name in storage.names():
+        blocks = [block for block in index.blocks(name) if block.language == language]
+        found.extend((name, block, text) for block, text in zip(blocks, read_blocks(storage.path_of(name), blocks)))
+    return found
+
+
+_index_versions = {}
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+@profiled('codeblocks.open_code_index')
+def open_code_index(folder):
+    """CodeBlockIndex of a folder or archive, re-scanning outputs changed since ingest."""
+    path = index_path(folder)
+    version = file_version(folder)
+    with _index_lock:
+        index = _indexes.get(path)
+        if index is None or _index_versions.get(path) != version:
+            index = CodeBlockIndex(path, folder)
+            index.update(folder)
+            _indexes[path] = index
+            _index_versions[path] = version
+    return index
@@ -0,0 +1,92 @@
+"""One corpus: its evaluations table, prompt and outputs, loaded lazily.
+
+The dashboards (app/app.py, its earlier iterations and the Gradio app) open
+their data folder through Corpus, so path handling, the fallback to a packed
+archive and the caches live in one place:
+
+    corpus = Corpus('app/data')
+    corpus.evaluations(display_names=True)   # cached until the CSV changes
+    corpus.output_names()                    # output2.md before output10.md
+    corpus.read_output(3)
+
+Nothing is read when a Corpus is created. Every accessor goes through the
+file-version caches of longcodegen.data and the indexes, so a warm call
+costs a stat(). Outputs are read through the storage backend of the folder
+or archive (longcodegen.storage), so search, similarity and the code-only
+view work the same on both.
+"""
+import os
+
+from longcodegen.cache import LRUCache
+from longcodegen.codeblocks import open_code_index
+from longcodegen.data import load_evaluations, load_output_files, load_text, table_page
+from longcodegen.htmlcache import open_html_cache
+from longcodegen.search import open_index
+from longcodegen.similarity import model_similarity, similar_outputs
+from longcodegen.storage import open_storage, resolve_outputs
+
+_positions = LRUCache(maxsize=8, name='corpus.output_positions')
+
+
+class Corpus:
+    def __init__(self, data_dir, evaluations_path=None, outputs_path=None, prompt_path=None,
+                 search_index_path=None):
+        self.data_dir = data_dir
+        self.evaluations_path = evaluations_path or os.path.join(data_dir, 'evaluations.csv')
+        self.prompt_path = prompt_path or os.path.join(data_dir, 'prompts', 'prompt.md')
+        # A packed archive of the outputs (working/scripts/pack.py) can stand in for the folder
+        self.outputs_path = resolve_outputs(outputs_path or os.path.join(data_dir, 'outputs'))
+        self.search_index_path = search_index_path or os.path.join(data_dir, 'search-index.sqlite')
+        self.storage = open_storage(self.outputs_path)
+
+    def missing(self):
+        """Messages for the inputs that don't exist, for the front ends to report."""
+        checks = [("Data file", self.evaluations_path), ("Prompt file", self.prompt_path),
+                  ("Outputs directory", self.outputs_path)]
+        return [f"{label} not found: {path}" for label, path in checks if not os.path.exists(path)]
+
+    def evaluations(self, display_names=False):
+        return load_evaluations(self.evaluations_path, display_names)
+
+    def table_page(self, page=0, page_size=50, sort_by=None, ascending=True, display_names=False):
+        return table_page(self.evaluations_path, page, page_size, sort_by, ascending, display_names)
+
+    def prompt(self):
+        return load_text(self.prompt_path)
+
+    def output_names(self):
+        """Output file names in natural order; their positions are the outputs' indexes in the viewers."""
+        return load_output_files(self.outputs_path)
+
+    def output_index(self, name):
+        """Position of an output in output_names(), or None."""
+        key = os.path.abspath(self.outputs_path)
+        version = self.storage.version()
+        positions = _positions.get(key, version=version)
+        if positions is None:
+            positions = {output: position for position, output in enumerate(self.output_names())}
+            _positions.put(key, positions, version=version)
+        return positions.get(name)
+
+    def output_path(self, index):
+        """Path of the output at index, a file or an archive member path."""
+        return self.storage.path_of(self.output_names()[index])
+
+    def read_output(self, index):
+        return self.storage.read_text(self.output_names()[index])
+
+    def html_cache(self):
+        """Pre-rendered HTML of the outputs' sections (longcodegen.htmlcache)."""
+        return open_html_cache(self.outputs_path)
+
+    def search_index(self):
+        return open_index(self.search_index_path, self.outputs_path, self.evaluations_path)
+
+    def code_index(self):
+        return open_code_index(self.outputs_path)
+
+    def model_similarity(self):
+        return model_similarity(self.outputs_path, self.evaluations_path)
+
+    def similar_outputs(self, threshold=0.5):
+        return similar_outputs(self.outputs_path, threshold)
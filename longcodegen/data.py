@@ -0,0 +1,137 @@
+"""Cached loaders for the evaluations table, the prompt and the outputs.
+
+Every loader is memoized on the file's mtime and size, so repeated calls
+cost one stat() until the file on disk changes. Cached values are shared
+between callers and must not be modified in place. pandas is imported on the
+first table load so views that never show the table don't pay for it.
+
+The evaluations table is read in chunks with compact dtypes: the label
+columns become categoricals and the counts are downcast to the smallest
+integer or float type that holds them, so a table with millions of runs
+stays small in memory. Views show it a page at a time through table_page().
+"""
+import os
+
+from longcodegen.cache import LRUCache, file_version, memoize_file
+from longcodegen.profiling import profiled, span
+from longcodegen.storage import open_storage
+
+# Column names shown in the Streamlit dashboard
+DISPLAY_COLUMNS = {
+    'model': 'Model',
+    'accessui': 'Access UI',
+    'codepercent': 'Code Percentage',
+    'pyblocks': 'Python Blocks',
+    'pyparsed': 'Parsed Python Blocks',
+    'pyfunctions': 'Functions',
+    'pyclasses': 'Classes',
+    'pyimports': 'Imports',
+    'pylines': 'Python Lines',
+    'pystatus': 'Python Check',
+    'codechars': 'Code Characters',
+    'charcount': 'Character Count',
+    'codeblocks': 'Code Blocks',
+    'output_number': 'Output Number',
+    'primarylanguage': 'Primary Language',
+    'languages': 'Languages'
+}
+
+
+# Label columns, stored as categoricals
+CATEGORY_COLUMNS = ['model', 'accessui', 'primarylanguage', 'pystatus']
+CHUNK_ROWS = 100_000
+
+_sort_orders = LRUCache(maxsize=16, name='data.sort_orders')
+
+
+def _downcast(chunk):
+    import pandas as pd
+
+    for column in chunk.columns:
+        if column in CATEGORY_COLUMNS:
+            continue
+        if pd.api.types.is_integer_dtype(chunk[column]):
+            chunk[column] = pd.to_numeric(chunk[column], downcast='integer')
+        elif pd.api.types.is_float_dtype(chunk[column]):
+            chunk[column] = pd.to_numeric(chunk[column], downcast='float')
+    return chunk
+
+
+def _concat_chunks(chunks):
+    """Concatenate chunks without turning categoricals back into strings.
+
+    pd.concat falls back to object dtype when the chunks' categories differ,
+    so label columns are combined with union_categoricals instead.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals(parts, sort_categories=True)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+@memoize_file(maxsize=4)
+@profiled('data.load_evaluations')
+def load_evaluations(path, display_names=False):
+    import pandas as pd
+
+    dtype = {column: 'category' for column in CATEGORY_COLUMNS}
+    with pd.read_csv(path, dtype=dtype, chunksize=CHUNK_ROWS) as reader:
+        chunks = [_downcast(chunk) for chunk in reader]
+    data = _concat_chunks(chunks) if chunks else pd.read_csv(path, dtype=dtype)
+    if display_names:
+        data.rename(columns=DISPLAY_COLUMNS, inplace=True)
+    return data
+
+
+def table_page(path, page=0, page_size=50, sort_by=None, ascending=True, display_names=False):
+    """One page of the evaluations table, optionally sorted, and the total row count.
+
+    Only the requested rows are copied out of the cached table. The sort
+    order of each column is computed once per file version and reused for
+    every page.
+    """
+    data = load_evaluations(path, display_names)
+    start = max(page, 0) * page_size
+    if sort_by is None:
+        return data.iloc[start:start + page_size], len(data)
+
+    key = (os.path.abspath(path), display_names, sort_by, ascending)
+    version = file_version(path)
+    order = _sort_orders.get(key, version=version)
+    if order is None:
+        with span('data.sort_order'):
+            order = data[sort_by].reset_index(drop=True).sort_values(
+                ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        _sort_orders.put(key, order, version=version)
+    return data.iloc[order[start:start + page_size]], len(data)
+
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+@memoize_file(maxsize=8)
+@profiled('data.load_text')
+def load_text(path):
+    return _read_text(path)
+
+
+@memoize_file(maxsize=4)
+@profiled('data.load_output_files')
+def load_output_files(folder):
+    """Output file names in folder, naturally sorted (output2 before output10).
+
+    folder can also be a packed archive, whose member names are returned.
+    """
+    return open_storage(folder).names()
+
@@ -0,0 +1,437 @@
+"""Export the dashboard as a static site.
+
+export_site() pre-renders what the Streamlit app shows into a directory of
+plain HTML that any web server can host: the data table a page at a time,
+the charts, the prompt, every output (through markdown2) and the report,
+plus a client-side search over the outputs.
+
+Exports are incremental. Every page is written with a key describing its
+inputs (the rows of a table page, an output's size and mtime and its
+labels, ...) and the keys are kept in .export/state.json inside the site;
+a page whose key is unchanged is not rendered again, and pages whose
+inputs disappeared are deleted. Outputs are rendered across a process pool.
+
+The search index is an inverted index of the words in every output, split
+into one JSON shard per two-letter word prefix under search/, so a query
+only downloads the shards of its own words. It is rebuilt only when an
+output page changed.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+from multiprocessing import Pool
+from urllib.parse import quote
+
+from longcodegen.analytics import METHODOLOGY, METRIC_COLUMNS, build_report, findings, metric_table
+from longcodegen.archive import open_archive, read_member, split_member
+from longcodegen.charts import bar_chart_png, chart_key
+from longcodegen.data import DISPLAY_COLUMNS, load_evaluations, load_output_files
+from longcodegen.htmlcache import highlight_css, render_markdown
+from longcodegen.manifest import atomic_write, file_sha256
+from longcodegen.search import output_labels, output_numbers
+
+# Bump when the page layout changes, so every page is rendered again
+EXPORT_VERSION = 1
+TABLE_PAGE_ROWS = 100
+OUTPUT_LIST_ROWS = 500
+CHART_COLUMNS = ['Character Count', 'Code Percentage', 'Code Blocks']
+
+# Words as the search page tokenizes them; keep in step with SEARCH_JS
+_WORD_RE = re.compile(r'[a-z0-9_]+')
+MIN_WORD, MAX_WORD = 2, 32
+
+NAV = [('Data', 'table/1.html'), ('Visualizations', 'charts.html'), ('Outputs', 'outputs.html'),
+       ('Prompt', 'prompt.html'), ('Search', 'search.html'), ('Report', 'report.html')]
+
+STYLE = """
+body { font-family: system-ui, sans-serif; margin: 0; color: #222; }
+nav { background: #f0f2f6; padding: 0.75em 1.5em; }
+nav a { margin-right: 1.25em; }
+main { max-width: 1100px; margin: 0 auto; padding: 1em 1.5em 3em; }
+table { border-collapse: collapse; font-size: 0.9em; }
+th, td { border: 1px solid #ddd; padding: 0.3em 0.6em; text-align: left; }
+pre { background: #f6f8fa; padding: 0.75em; overflow-x: auto; }
+.pager a { margin-right: 1em; }
+#results p { margin: 0.4em 0; }
+"""
+
+SEARCH_JS = """
+const WORD = /[a-z0-9_]+/g, MIN_WORD = 2, MAX_WORD = 32, LIMIT = 200;
+const shards = {};
+let docs = null;
+
+async function fetchJSON(url, missing) {
+  const response = await fetch(url);
+  if (response.status === 404) return missing;
+  if (!response.ok) throw new Error(url + ': ' + response.status);
+  return response.json();
+}
+
+function shard(prefix) {
+  if (!(prefix in shards)) shards[prefix] = fetchJSON('search/' + prefix + '.json', {});
+  return shards[prefix];
+}
+
+// Postings are stored as gaps between ascending document numbers
+function decode(gaps) {
+  let doc = 0;
+  return gaps.map(gap => doc += gap);
+}
+
+async function postings(word, prefix) {
+  const terms = await shard(word.slice(0, 2));
+  if (!prefix) return decode(terms[word] || []);
+  const matches = new Set();
+  for (const term in terms) {
+    if (term.startsWith(word)) decode(terms[term]).forEach(doc => matches.add(doc));
+  }
+  return Array.from(matches).sort((a, b) => a - b);
+}
+
+async function search(query) {
+  const text = query.toLowerCase();
+  const words = (text.match(WORD) || []).filter(word => word.length >= MIN_WORD).map(word => word.slice(0, MAX_WORD));
+  if (!words.length) return [];
+  // The last word matches as a prefix while it is being typed
+  const prefixed = !/\\s$/.test(query);
+  const lists = await Promise.all(words.map((word, i) => postings(word, prefixed && i === words.length - 1)));
+  let result = lists.reduce((a, b) => { const keep = new Set(b); return a.filter(doc => keep.has(doc)); });
+  docs = docs || await fetchJSON('search/docs.json', []);
+  return result.slice(0, LIMIT).map(doc => docs[doc]);
+}
+
+function show(hits, query) {
+  const results = document.getElementById('results');
+  results.replaceChildren();
+  const summary = document.createElement('p');
+  summary.textContent = query ? (hits.length ? hits.length + (hits.length === LIMIT ? '+' : '') + ' outputs' : 'No matches') : '';
+  results.append(summary);
+  for (const [href, title, name] of hits) {
+    const line = document.createElement('p');
+    const link = document.createElement('a');
+    link.href = href;
+    link.textContent = title;
+    line.append(link, ' \\u00b7 ' + name);
+    results.append(line);
+  }
+}
+
+let pending = 0;
+document.getElementById('query').addEventListener('input', async event => {
+  const query = event.target.value, ticket = ++pending;
+  const hits = await search(query);
+  if (ticket === pending) show(hits, query.trim());
+});
+"""
+
+
+class ExportState:
+    """Keys of the pages written by the last export, in <site>/.export/state.json."""
+
+    def __init__(self, site):
+        self.path = os.path.join(site, '.export', 'state.json')
+        self.pages = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            if content.get('version') == EXPORT_VERSION:
+                self.pages = content.get('pages', {})
+
+    def save(self):
+        content = {'version': EXPORT_VERSION, 'pages': self.pages}
+        atomic_write(self.path, lambda file: json.dump(content, file, separators=(',', ':')))
+
+
+def digest(*parts):
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def write_page(site, relpath, content):
+    path = os.path.join(site, relpath)
+    if isinstance(content, bytes):
+        atomic_write(path, lambda file: file.write(content), binary=True)
+    else:
+        atomic_write(path, lambda file: file.write(content))
+
+
+def page_html(title, body, relpath, head=''):
+    """A full page with the site navigation; links are made relative to relpath."""
+    root = '../' * relpath.count('/')
+    links = ''.join(f'<a href="{root}{href}">{label}</a>' for label, href in NAV)
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f'<title>{html.escape(title)} · LLM Long Code Generation</title>'
+            f'<link rel="stylesheet" href="{root}style.css">{head}</head>\n'
+            f'<body><nav><a href="{root}index.html"><b>LLM Long Code Generation</b></a>{links}</nav>\n'
+            f'<main><h1>{html.escape(title)}</h1>\n{body}\n</main></body></html>\n')
+
+
+def pager(previous, following, middle=''):
+    links = []
+    if previous:
+        links.append(f'<a href="{previous}">&larr; Previous</a>')
+    if middle:
+        links.append(middle)
+    if following:
+        links.append(f'<a href="{following}">Next &rarr;</a>')
+    return f'<p class="pager">{"".join(links)}</p>'
+
+
+def style_css():
+    # markdown2 highlights fenced code with Pygments when it is installed
+    return STYLE + highlight_css()
+
+
+def output_page_name(name):
+    return 'outputs/' + os.path.splitext(name)[0] + '.html'
+
+
+def output_list_name(page):
+    return 'outputs.html' if page == 0 else f'outputs-{page + 1}.html'
+
+
+def output_words(text):
+    """Distinct searchable words of an output, lower-cased."""
+    return {word[:MAX_WORD] for word in _WORD_RE.findall(text.lower()) if len(word) >= MIN_WORD}
+
+
+def words_path(site, name):
+    return os.path.join(site, '.export', 'words', name + '.txt')
+
+
+def _render_output(task):
+    """Write one output's page and its word list (run in pool workers)."""
+    site, path, relpath, title, subtitle, previous, following, listing = task
+    text = read_member(path)
+    body = (f'<p>{html.escape(subtitle)}</p>'
+            + pager(previous, following, f'<a href="../{listing}">All outputs</a>')
+            + render_markdown(text)
+            + pager(previous, following))
+    write_page(site, relpath, page_html(title, body, relpath))
+    words = '\n'.join(sorted(output_words(text)))
+    atomic_write(words_path(site, os.path.basename(path)), lambda file: file.write(words))
+
+
+def output_key(path):
+    """What an output page depends on in the source: its size and mtime (or crc in an archive)."""
+    member = split_member(path)
+    if member:
+        entry = open_archive(member[0]).entries[member[1]]
+        return entry.size, entry.crc32
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class SiteExport:
+    def __init__(self, site, evaluations_path, outputs_path, prompt_path, workers=None, chunksize=16):
+        self.site = site
+        self.evaluations_path = evaluations_path
+        self.outputs_path = outputs_path
+        self.prompt_path = prompt_path
+        self.workers = workers
+        self.chunksize = chunksize
+        self.state = ExportState(site)
+        self.pages = {}  # Keys of the pages in this export
+        self.rendered = 0
+        self.outputs_changed = False
+
+    def page(self, relpath, key, render):
+        """Write relpath with render() unless it was written from the same key."""
+        key = digest(EXPORT_VERSION, key)
+        self.pages[relpath] = key
+        if self.state.pages.get(relpath) == key and os.path.exists(os.path.join(self.site, relpath)):
+            return
+        write_page(self.site, relpath, render())
+        self.state.pages[relpath] = key
+        self.rendered += 1
+
+    def export_static(self):
+        self.page('style.css', style_css(), style_css)
+        self.page('search.js', SEARCH_JS, lambda: SEARCH_JS)
+        body = ('<input id="query" type="search" size="60" autofocus '
+                'placeholder="Words in the outputs, e.g. pyqt5 keyring"><div id="results"></div>'
+                '<script src="search.js"></script>')
+        self.page('search.html', body, lambda: page_html("Search", body, 'search.html'))
+
+    def export_index(self, data, names):
+        body = ('<p>This experiment was conducted on the 10th of December 2024 by Daniel Rosehill. The purpose '
+                'of this experiment was to compare different large language models\' ability to generate a long '
+                'continuous output in response to a large and demanding prompt.</p>'
+                f'<p>{len(data):,} evaluated runs and {len(names):,} outputs.</p>'
+                '<p><a href="https://github.com/danielrosehill/LLM-Long-Codegen-Test">'
+                'danielrosehill/LLM-Long-Codegen-Test on GitHub</a></p>')
+        self.page('index.html', body, lambda: page_html("LLM Long Code Generation Output Experiment", body,
+                                                        'index.html'))
+
+    def export_table(self, data, row_hashes):
+        """The data table in pages of TABLE_PAGE_ROWS; a page is only rewritten when its rows change."""
+        page_count = max((len(data) + TABLE_PAGE_ROWS - 1) // TABLE_PAGE_ROWS, 1)
+        for page in range(page_count):
+            start = page * TABLE_PAGE_ROWS
+            relpath = f'table/{page + 1}.html'
+            has_next = page + 1 < page_count
+            key = hashlib.sha256(row_hashes[start:start + TABLE_PAGE_ROWS].tobytes()).hexdigest()
+
+            def render(start=start, page=page, has_next=has_next, relpath=relpath):
+                rows = data.iloc[start:start + TABLE_PAGE_ROWS].rename(columns=DISPLAY_COLUMNS)
+                summary = f'<p>Rows {start + 1} to {start + len(rows)}</p>'
+                nav = pager(f'{page}.html' if page else '', f'{page + 2}.html' if has_next else '')
+                return page_html(f"Data Table, page {page + 1}",
+                                 nav + rows.to_html(index=False, float_format='{:.2f}'.format, na_rep='')
+                                 + summary + nav, relpath)
+
+            self.page(relpath, (key, has_next), render)
+
+    def export_charts(self, data):
+        display = data.rename(columns=DISPLAY_COLUMNS)
+        keys = []
+        for column in CHART_COLUMNS:
+            key = chart_key(display, column, 'Model')
+            image = 'charts/' + column.lower().replace(' ', '-') + '.png'
+            self.page(image, key, lambda column=column, key=key: bar_chart_png(display, column, 'Model', key=key))
+            keys.append((image, column))
+        body = ''.join(f'<figure><img src="{image}" alt="{column}" width="1000"><figcaption>{column}</figcaption>'
+                       f'</figure>' for image, column in keys)
+        self.page('charts.html', body, lambda: page_html("Visualizations", body, 'charts.html'))
+
+    def export_prompt(self):
+        self.page('prompt.html', file_sha256(self.prompt_path),
+                  lambda: page_html("Prompt", render_markdown(read_member(self.prompt_path)), 'prompt.html'))
+
+    def export_report(self, table_digest):
+        def render():
+            report = build_report(self.evaluations_path)
+            number_format = {"Mean": "{:,.2f}", "Variance": "{:,.2f}", "Min": "{:,.2f}", "Max": "{:,.2f}",
+                             "Spread (%)": "{:.1f}"}
+            parts = [render_markdown(METHODOLOGY), f'<h2>Findings across {report.runs} runs</h2>',
+                     render_markdown(findings(report)),
+                     '<p>Spread is how much shorter a group\'s smallest run is than its largest; 0 for a single '
+                     'run.</p>']
+            for column in METRIC_COLUMNS:
+                parts.append(f'<h2>{DISPLAY_COLUMNS[column]}</h2>')
+                for heading, summary in (("By model", report.by_model), ("By access UI", report.by_accessui)):
+                    table = metric_table(summary, column)
+                    parts.append(f'<h3>{heading}</h3>' + table.style.format(number_format, na_rep="-").to_html())
+            return page_html("Thoughts", '\n'.join(parts), 'report.html')
+
+        self.page('report.html', table_digest, render)
+
+    def export_outputs(self, data, names):
+        """Output pages (rendered in a pool) and the paginated list of outputs."""
+        paths = [os.path.join(self.outputs_path, name) for name in names]
+        rows = data[['output_number', 'model', 'accessui']].astype(object).fillna('').to_dict('records')
+        labels = output_labels(paths, rows, output_numbers(paths, self.evaluations_path))
+        titles = []
+        tasks = []
+        for i, (name, path) in enumerate(zip(names, paths)):
+            model, accessui = labels.get(path, ('', ''))
+            title = model or name
+            subtitle = ' · '.join(part for part in (accessui, name) if part)
+            titles.append((title, subtitle))
+            relpath = output_page_name(name)
+            previous = quote(os.path.basename(output_page_name(names[i - 1]))) if i else ''
+            following = quote(os.path.basename(output_page_name(names[i + 1]))) if i + 1 < len(names) else ''
+            listing = output_list_name(i // OUTPUT_LIST_ROWS)
+            key = digest(EXPORT_VERSION, output_key(path), title, subtitle, previous, following, listing)
+            self.pages[relpath] = key
+            if (self.state.pages.get(relpath) != key or not os.path.exists(os.path.join(self.site, relpath))
+                    or not os.path.exists(words_path(self.site, name))):
+                tasks.append((key, (self.site, path, relpath, title, subtitle, previous, following, listing)))
+
+        if tasks:
+            work = [task for _, task in tasks]
+            if self.workers == 1 or len(work) <= 1:
+                for task in work:
+                    _render_output(task)
+            else:
+                with Pool(processes=self.workers) as pool:
+                    for _ in pool.imap_unordered(_render_output, work, chunksize=self.chunksize):
+                        pass
+            for key, task in tasks:
+                self.state.pages[task[2]] = key
+            self.rendered += len(tasks)
+            self.outputs_changed = True
+
+        for start in range(0, max(len(names), 1), OUTPUT_LIST_ROWS):
+            page = start // OUTPUT_LIST_ROWS
+            relpath = output_list_name(page)
+            chunk = list(zip(names[start:start + OUTPUT_LIST_ROWS], titles[start:start + OUTPUT_LIST_ROWS]))
+            has_next = start + OUTPUT_LIST_ROWS < len(names)
+
+            def render(start=start, page=page, chunk=chunk, has_next=has_next, relpath=relpath):
+                nav = pager(output_list_name(page - 1) if page else '', output_list_name(page + 1) if has_next else '')
+                items = ''.join(f'<li value="{start + i}"><a href="{quote(output_page_name(name))}">'
+                                f'{html.escape(title)}</a> · {html.escape(subtitle)}</li>'
+                                for i, (name, (title, subtitle)) in enumerate(chunk))
+                return page_html("Outputs", f'{nav}<ol start="{start}">{items}</ol>{nav}', relpath)
+
+            self.page(relpath, (chunk, has_next), render)
+        return titles
+
+    def export_search(self, names, titles):
+        """Shard the words of every output into search/<prefix>.json, plus search/docs.json."""
+        docs = [[quote(output_page_name(name)), title, subtitle] for name, (title, subtitle) in zip(names, titles)]
+        docs_content = json.dumps(docs, separators=(',', ':'))
+        if (not self.outputs_changed and self.state.pages.get('search/docs.json') == digest(EXPORT_VERSION, docs_content)
+                and os.path.exists(os.path.join(self.site, 'search', 'docs.json'))):
+            self.pages.update((relpath, key) for relpath, key in self.state.pages.items()
+                              if relpath.startswith('search/'))
+            return
+
+        postings = {}
+        for doc, name in enumerate(names):
+            with open(words_path(self.site, name), 'r', encoding='utf-8') as file:
+                for word in file.read().split():
+                    postings.setdefault(word, []).append(doc)
+        shards = {}
+        for word, docs_of_word in postings.items():
+            # Stored as gaps between document numbers, which keeps the shards small
+            shards.setdefault(word[:2], {})[word] = [doc - previous for previous, doc
+                                                     in zip([0] + docs_of_word, docs_of_word)]
+        # Shards whose postings came out the same are left alone
+        for prefix, terms in shards.items():
+            content = json.dumps(terms, separators=(',', ':'))
+            self.page(f'search/{prefix}.json', content, lambda content=content: content)
+        self.page('search/docs.json', docs_content, lambda: docs_content)
+
+    def remove_stale(self):
+        """Delete pages (and word lists) written by an earlier export that this one no longer has."""
+        removed = 0
+        for relpath in list(self.state.pages):
+            if relpath in self.pages:
+                continue
+            del self.state.pages[relpath]
+            for path in (os.path.join(self.site, relpath),
+                         words_path(self.site, os.path.splitext(os.path.basename(relpath))[0] + '.md')
+                         if relpath.startswith('outputs/') else None):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+            removed += 1
+        return removed
+
+    def run(self):
+        import pandas as pd
+
+        data = load_evaluations(self.evaluations_path)
+        names = load_output_files(self.outputs_path)
+        row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+        table_digest = hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+        self.export_static()
+        self.export_index(data, names)
+        self.export_table(data, row_hashes)
+        self.export_charts(data)
+        self.export_prompt()
+        self.export_report(table_digest)
+        titles = self.export_outputs(data, names)
+        self.export_search(names, titles)
+        removed = self.remove_stale()
+        self.state.save()
+        return self.rendered, len(self.pages), removed
+
+
+def export_site(site, evaluations_path, outputs_path, prompt_path, workers=None, chunksize=16):
+    """Export the dashboard into site; returns (pages written, pages in the site, pages removed)."""
+    return SiteExport(site, evaluations_path, outputs_path, prompt_path, workers, chunksize).run()
@@ -0,0 +1,150 @@
+"""Streaming code-fence scanner for model outputs.
+
+Outputs are scanned one line at a time, so memory use stays flat no matter
+how large a file is. Fences follow the CommonMark rules: a run of three or
+more backticks or tildes, and a closing fence made of the same character
+that is at least as long as the opening one. A fence that is never closed
+runs to the end of the file. Indentation is not limited to three spaces
+because models routinely nest fences inside list items.
+"""
+import re
+from dataclasses import dataclass, field
+
+FENCE_RE = re.compile(r'^[ \t]*(`{3,}|~{3,})(.*)$')
+
+
+@dataclass
+class CodeBlock:
+    language: str
+    start_line: int
+    end_line: int = 0
+    char_count: int = 0
+    line_count: int = 0
+    terminated: bool = False
+
+
+@dataclass
+class ScanResult:
+    description: str = ''
+    title: str = ''
+    char_count: int = 0
+    code_char_count: int = 0
+    blocks: list = field(default_factory=list)
+
+    @property
+    def code_blocks(self):
+        return len(self.blocks)
+
+    @property
+    def code_percentage(self):
+        return (self.code_char_count / self.char_count) * 100 if self.char_count > 0 else 0
+
+    @property
+    def languages(self):
+        """Number of code blocks per language tag ('' when untagged)."""
+        counts = {}
+        for block in self.blocks:
+            counts[block.language] = counts.get(block.language, 0) + 1
+        return counts
+
+    @property
+    def language_chars(self):
+        """Code characters per language tag ('' when untagged)."""
+        chars = {}
+        for block in self.blocks:
+            chars[block.language] = chars.get(block.language, 0) + block.char_count
+        return chars
+
+
+def parse_fence(line):
+    """Return (marker, info) if the line opens or closes a fence, else None."""
+    match = FENCE_RE.match(line.rstrip('\r\n'))
+    if not match:
+        return None
+    marker, info = match.group(1), match.group(2).strip()
+    # A backtick fence can't carry backticks in its info string, otherwise
+    # inline code such as ```foo``` would open a block.
+    if marker[0] == '`' and '`' in info:
+        return None
+    return marker, info
+
+
+def description_from_line(line):
+    """Turn the first line of an output into a short description."""
+    line = line.strip()
+    return line.lstrip('#').strip() if line.startswith('#') else line
+
+
+class FenceScanner:
+    """Incremental scanner: feed() lines in order, then call finish()."""
+
+    def __init__(self):
+        self.result = ScanResult()
+        self.line_number = 0
+        self.open_block = None
+        self.open_marker = None
+
+    @property
+    def in_code(self):
+        return self.open_block is not None
+
+    def feed(self, line):
+        """Consume one line (with its newline) and return its kind.
+
+        The kind is 'open' or 'close' for fence lines, 'code' for lines
+        inside a block and 'text' for everything else.
+        """
+        result = self.result
+        if self.line_number == 0:
+            result.description = description_from_line(line)
+            if line.lstrip().startswith('#'):
+                result.title = result.description
+        self.line_number += 1
+        result.char_count += len(line)
+
+        fence = parse_fence(line)
+        if self.open_block is None:
+            if fence is None:
+                return 'text'
+            marker, info = fence
+            self.open_marker = marker
+            self.open_block = CodeBlock(language=info.split()[0].lower() if info else '',
+                                        start_line=self.line_number)
+            return 'open'
+
+        marker = self.open_marker
+        if fence is not None and not fence[1] and fence[0][0] == marker[0] and len(fence[0]) >= len(marker):
+            self._close(terminated=True)
+            return 'close'
+
+        block = self.open_block
+        block.char_count += len(line)
+        block.line_count += 1
+        result.code_char_count += len(line)
+        return 'code'
+
+    def _close(self, terminated):
+        block = self.open_block
+        block.end_line = self.line_number
+        block.terminated = terminated
+        self.result.blocks.append(block)
+        self.open_block = None
+        self.open_marker = None
+
+    def finish(self):
+        if self.open_block is not None:
+            self._close(terminated=False)
+        return self.result
+
+
+def scan_lines(lines):
+    scanner = FenceScanner()
+    for line in lines:
+        scanner.feed(line)
+    return scanner.finish()
+
+
+def scan_file(path):
+    """Scan a markdown file in a single pass without reading it into memory."""
+    with open(path, 'r', encoding='utf-8') as file:
+        return scan_lines(file)
@@ -0,0 +1,311 @@
+"""Pre-rendered HTML of output sections, in a content-addressed cache.
+
+Turning an output's Markdown into HTML (markdown2, and Pygments for its code
+blocks) is the slowest part of opening it, so it is done at ingest
+(`calculator.py --html-cache`) and the viewers only look the result up. The
+viewers render a page of sections at a time (longcodegen.sections), so that
+is the unit of the cache: an entry is keyed by the SHA-256 of a section's
+kind, language and text, and sections that occur in many outputs are stored
+once.
+
+The cache is a SQLite file next to the outputs, e.g.
+data/outputs.html-cache.sqlite for data/outputs, holding the HTML compressed
+with zlib. It is bounded by size: every lookup refreshes an entry's last-use
+time (to the minute), and once the entries outgrow max_bytes the least
+recently used ones are evicted until a tenth of the budget is free again.
+Misses are rendered on the spot and stored, so an evicted section costs one
+render.
+
+Each entry records the renderer that made it: a version per kind of section
+(TEXT_RENDERER, CODE_RENDERER) together with the markdown2 or Pygments
+version. An entry from another renderer is treated as a miss, and the next
+ingest re-renders only those entries, so upgrading Pygments re-renders the
+code but not the prose. Rendering is sanitized either way: raw HTML in the
+Markdown is escaped and link targets with unsafe schemes are dropped by
+markdown2's safe mode.
+"""
+import hashlib
+import html
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from multiprocessing import Pool
+
+from longcodegen.profiling import profiled, span
+from longcodegen.sections import load_sections, read_section
+from longcodegen.storage import open_storage
+
+# Bump when the HTML made for a kind of section changes, so only those
+# entries are rendered again
+TEXT_RENDERER = 1
+CODE_RENDERER = 1
+MARKDOWN_EXTRAS = ['fenced-code-blocks', 'tables']
+DEFAULT_MAX_BYTES = int(os.environ.get('LONGCODEGEN_HTML_CACHE_MB', 256)) * 1024 * 1024
+# Last-use times are only written back when they are older than this, so
+# lookups rarely write
+USED_RESOLUTION = 60
+# How many entries the viewers store between two eviction passes
+PRUNE_EVERY = 256
+# How many outputs ingest hashes before handing their misses to the pool
+BATCH_OUTPUTS = 256
+LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    renderer TEXT NOT NULL,
+    html BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS outputs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    renderers TEXT NOT NULL
+);
+"""
+
+
+def render_markdown(text):
+    """HTML of Markdown, with any raw HTML in it escaped."""
+    import markdown2
+
+    return markdown2.markdown(text, extras=MARKDOWN_EXTRAS, safe_mode='escape')
+
+
+def render_code(text, language=''):
+    """HTML of a code block, highlighted with Pygments when it knows the language."""
+    try:
+        from pygments import highlight
+        from pygments.formatters import HtmlFormatter
+        from pygments.lexers import TextLexer, get_lexer_by_name
+        from pygments.util import ClassNotFound
+    except ImportError:
+        return f'<pre><code class="language-{html.escape(language)}">{html.escape(text)}</code></pre>'
+    try:
+        lexer = get_lexer_by_name(language) if language else TextLexer()
+    except ClassNotFound:
+        lexer = TextLexer()
+    return highlight(text, lexer, HtmlFormatter(cssclass='codehilite'))
+
+
+def render_section(text, kind, language=''):
+    return render_code(text, language) if kind == 'code' else render_markdown(text)
+
+
+@lru_cache(maxsize=None)
+def highlight_css():
+    """Style rules for the highlighted code, to be included once per page."""
+    try:
+        from pygments.formatters import HtmlFormatter
+    except ImportError:
+        return ''
+    return HtmlFormatter().get_style_defs('.codehilite')
+
+
+@lru_cache(maxsize=None)
+def renderer_version(kind):
+    """What an entry of this kind of section is rendered with."""
+    if kind == 'code':
+        try:
+            import pygments
+        except ImportError:
+            return f'{CODE_RENDERER}/plain'
+        return f'{CODE_RENDERER}/pygments-{pygments.__version__}'
+    import markdown2
+
+    return f'{TEXT_RENDERER}/markdown2-{markdown2.__version__}'
+
+
+def section_digest(text, kind, language=''):
+    return hashlib.sha256(f'{kind}\0{language}\0{text}'.encode('utf-8')).hexdigest()
+
+
+def _render_task(task):
+    """(digest, compressed HTML, kind) of one section (run in pool workers)."""
+    digest, text, kind, language = task
+    return digest, zlib.compress(render_section(text, kind, language).encode('utf-8')), kind
+
+
+def cache_path(folder):
+    """Where the HTML cache of a folder or archive of outputs lives."""
+    return os.path.normpath(folder) + '.html-cache.sqlite'
+
+
+class HTMLCache:
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self._stored = 0
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call, as for the search index; the
+        # timeout lets viewers and ingest write at the same time
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @profiled('htmlcache.render')
+    def render(self, items):
+        """HTML of each (text, kind, language) item, from the cache or rendered and stored."""
+        digests = [section_digest(*item) for item in items]
+        found = self._lookup(set(digests))
+        missing = {digest: item for digest, item in zip(digests, items) if digest not in found}
+        if missing:
+            with span('htmlcache.render_missing'):
+                rendered = [_render_task((digest,) + tuple(item)) for digest, item in missing.items()]
+            self._store(rendered)
+            found.update((digest, zlib.decompress(data).decode('utf-8')) for digest, data, _ in rendered)
+        return [found[digest] for digest in digests]
+
+    def render_sections(self, output_path, sections):
+        """HTML of some sections of one output."""
+        return self.render([(read_section(output_path, section), section.kind, section.language)
+                            for section in sections])
+
+    def _lookup(self, digests):
+        """{digest: HTML} of the entries made by the current renderers."""
+        if not digests:
+            return {}
+        now = int(time.time())
+        found, touched = {}, []
+        digests = list(digests)
+        with self._connect() as connection:
+            # In chunks, to stay under SQLite's limit on query parameters
+            for start in range(0, len(digests), LOOKUP_CHUNK):
+                chunk = digests[start:start + LOOKUP_CHUNK]
+                for digest, kind, renderer, data, used in connection.execute(
+                        f"SELECT digest, kind, renderer, html, used FROM entries WHERE digest IN ({','.join('?' * len(chunk))})",
+                        chunk):
+                    if renderer != renderer_version(kind):
+                        continue
+                    found[digest] = zlib.decompress(data).decode('utf-8')
+                    if used < now - USED_RESOLUTION:
+                        touched.append(digest)
+            if touched:
+                connection.executemany("UPDATE entries SET used = ? WHERE digest = ?",
+                                       [(now, digest) for digest in touched])
+        return found
+
+    def _store(self, rendered):
+        now = int(time.time())
+        with self._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                   [(digest, kind, renderer_version(kind), data, len(data), now)
+                                    for digest, data, kind in rendered])
+        self._stored += len(rendered)
+        if self._stored >= PRUNE_EVERY:
+            self.prune()
+
+    def prune(self):
+        """Evict entries until they fit in max_bytes; returns how many were evicted.
+
+        Entries made by an old renderer go first, then the least recently
+        used ones, until a tenth of the budget is free.
+        """
+        self._stored = 0
+        with self._connect() as connection:
+            total = connection.execute("SELECT total(size) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            current = (renderer_version('text'), renderer_version('code'))
+            evict, target = [], self.max_bytes * 0.9
+            for digest, size in connection.execute(
+                    "SELECT digest, size FROM entries ORDER BY renderer IN (?, ?), used", current):
+                if total <= target:
+                    break
+                evict.append((digest,))
+                total -= size
+            connection.executemany("DELETE FROM entries WHERE digest = ?", evict)
+        return len(evict)
+
+    def refresh(self, folder, workers=None, chunksize=16):
+        """Pre-render the sections of every output in folder (or archive) that aren't cached.
+
+        Outputs unchanged since their last refresh under the same renderers
+        are skipped without being read. Returns (rendered, outputs read)
+        counts.
+        """
+        storage = open_storage(folder)
+        renderers = f"{renderer_version('text')} {renderer_version('code')}"
+        with self._connect() as connection:
+            known = {row[0]: row[1:] for row in connection.execute("SELECT name, size, mtime_ns, renderers FROM outputs")}
+        changed = []
+        for name in storage.names():
+            stat = storage.stat(name)
+            if known.get(name) != (stat.st_size, stat.st_mtime_ns, renderers):
+                changed.append((name, stat))
+        rendered = 0
+        pool = Pool(processes=workers) if workers != 1 and len(changed) > 1 else None
+        try:
+            for start in range(0, len(changed), BATCH_OUTPUTS):
+                batch = changed[start:start + BATCH_OUTPUTS]
+                rendered += self._refresh_batch(storage, batch, pool, chunksize)
+                with self._connect() as connection:
+                    connection.executemany("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)",
+                                           [(name, stat.st_size, stat.st_mtime_ns, renderers)
+                                            for name, stat in batch])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        with self._connect() as connection:
+            names = set(storage.names())
+            connection.executemany("DELETE FROM outputs WHERE name = ?",
+                                   [(name,) for name in known if name not in names])
+        self.prune()
+        return rendered, len(changed)
+
+    def _refresh_batch(self, storage, batch, pool, chunksize):
+        tasks = {}
+        for name, _ in batch:
+            path = storage.path_of(name)
+            for section in load_sections(path):
+                text = read_section(path, section)
+                tasks[section_digest(text, section.kind, section.language)] = (text, section.kind, section.language)
+        found = self._lookup(set(tasks))
+        tasks = [(digest,) + item for digest, item in tasks.items() if digest not in found]
+        if not tasks:
+            return 0
+        if pool is None:
+            rendered = [_render_task(task) for task in tasks]
+        else:
+            rendered = list(pool.imap(_render_task, tasks, chunksize=chunksize))
+        self._store(rendered)
+        return len(rendered)
+
+    def stats(self):
+        """(entries, stored bytes, entries made by an old renderer)."""
+        current = (renderer_version('text'), renderer_version('code'))
+        with self._connect() as connection:
+            entries, size = connection.execute("SELECT count(*), total(size) FROM entries").fetchone()
+            stale = connection.execute("SELECT count(*) FROM entries WHERE renderer NOT IN (?, ?)",
+                                       current).fetchone()[0]
+        return entries, int(size), stale
+
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def open_html_cache(folder):
+    """The HTMLCache of a folder or archive of outputs, shared by the viewer's threads."""
+    path = cache_path(folder)
+    with _cache_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = HTMLCache(path)
+    return cache
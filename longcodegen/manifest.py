@@ -0,0 +1,93 @@
+"""Content-hash manifest for incremental scoring.
+
+The manifest is a JSON sidecar that remembers, for every scored output, its
+size, mtime, SHA-256 and the row it produced. A file whose size and mtime are
+unchanged is trusted without being read; one whose stat changed is hashed and
+only re-scored when its content actually differs.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+# Bump when the row schema changes, so rows cached by older versions are re-scored
+MANIFEST_VERSION = 3
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write(path, write, binary=False):
+    """Call write(file) on a temp file next to path, then move it into place.
+
+    The file is opened as UTF-8 text, or for bytes with binary=True.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(path) + '.')
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', newline='', encoding='utf-8')) as file:
+            write(file)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def manifest_path(csv_path):
+    """Where calculator.py keeps the manifest of an evaluations CSV by default."""
+    return os.path.splitext(csv_path)[0] + '.manifest.json'
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            if content.get('version') == MANIFEST_VERSION:
+                self.entries = content.get('files', {})
+
+    def key(self, path):
+        """Manifest key for a file: its path relative to the manifest."""
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def unchanged(self, key, stat):
+        entry = self.entries.get(key)
+        return entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+    def known_hash(self, key):
+        entry = self.entries.get(key)
+        return entry['sha256'] if entry else None
+
+    def row(self, key):
+        entry = self.entries.get(key)
+        return dict(entry['row']) if entry else None
+
+    def record(self, key, stat, sha256, row):
+        self.entries[key] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'row': row,
+        }
+
+    def prune(self, live_keys):
+        """Forget files that no longer exist and return their entries."""
+        removed = {key: entry for key, entry in self.entries.items() if key not in live_keys}
+        for key in removed:
+            del self.entries[key]
+        return removed
+
+    def save(self):
+        content = {'version': MANIFEST_VERSION, 'files': self.entries}
+        atomic_write(self.path, lambda file: json.dump(content, file, indent=1, sort_keys=True))
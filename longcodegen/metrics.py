@@ -0,0 +1,108 @@
+"""Per-output metrics in the evaluations.csv schema."""
+import io
+import os
+import re
+
+from longcodegen.fences import scan_file, scan_lines
+from longcodegen.syntax import SYNTAX_COLUMNS, SYNTAX_TIMEOUT, python_metrics, timed_out_metrics
+
+EVALUATION_COLUMNS = (['model', 'accessui', 'charcount', 'codechars', 'codepercent'] + SYNTAX_COLUMNS
+                      + ['codeblocks', 'output_number', 'primarylanguage', 'languages'])
+
+# Separators models and humans use between the model name and the access UI
+# in the first heading, e.g. "Qwen 72B Instruct - Via Hugging Face Chat".
+_UI_SEPARATOR_RE = re.compile(r'\s+-\s+|\s+\(|\s+via\s+|\s+by\s+', re.IGNORECASE)
+_OUTPUT_NUMBER_RE = re.compile(r'^output(\d+)$')
+
+
+def natural_key(name):
+    """Sort key that orders output2 before output10."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def list_outputs(folder):
+    """Markdown files in folder, in natural order."""
+    return sorted((f for f in os.listdir(folder) if f.endswith('.md')), key=natural_key)
+
+
+def output_number(filename):
+    """The N of an outputN.md file, or None for any other name."""
+    match = _OUTPUT_NUMBER_RE.match(os.path.splitext(os.path.basename(filename))[0])
+    return int(match.group(1)) if match else None
+
+
+def number_outputs(numbers, floor=0):
+    """Fill in the row numbers of outputs not named outputN.md (None in numbers).
+
+    They are numbered after the highest known number (and after floor, the
+    highest number already taken elsewhere), in order. calculator.py numbers
+    its rows this way and the dashboards label outputs the same way, so both
+    agree on which row belongs to which file.
+    """
+    next_number = max(max((number for number in numbers if number is not None), default=0), floor) + 1
+    filled = []
+    for number in numbers:
+        if number is None:
+            number = next_number
+            next_number += 1
+        filled.append(number)
+    return filled
+
+
+def split_description(description):
+    """Split a heading such as 'Gemini 1.5 Pro Via Google AI Studio' into (model, accessui)."""
+    match = _UI_SEPARATOR_RE.search(description)
+    if not match:
+        return description, ''
+    model = description[:match.start()].strip()
+    accessui = description[match.end():].strip()
+    if match.group().strip() == '(' and accessui.endswith(')'):
+        accessui = accessui[:-1]
+    if accessui.lower().startswith('via '):
+        accessui = accessui[4:]
+    return model, accessui.strip()
+
+
+def language_summary(result):
+    """(primary language, 'python 4, bash 2') of a scan, by code characters.
+
+    Untagged blocks are reported as 'untagged'.
+    """
+    chars = result.language_chars
+    counts = result.languages
+    ordered = sorted(chars, key=lambda language: (-chars[language], language))
+    names = [language or 'untagged' for language in ordered]
+    summary = ', '.join(f"{name} {counts[language]}" for name, language in zip(names, ordered))
+    return (names[0] if names else ''), summary
+
+
+def score_file(path, timeout=SYNTAX_TIMEOUT, text=None, python=True):
+    """Score one output and return a row dict keyed by EVALUATION_COLUMNS.
+
+    The output is read from path unless its text is given, as it is for
+    archive members. timeout bounds the seconds spent parsing the output's
+    Python blocks; with python=False they aren't parsed and the syntax
+    columns are reported as timed out.
+
+    output_number is left as None for files that aren't named outputN.md;
+    callers number those by their position in the run.
+    """
+    result = scan_file(path) if text is None else scan_lines(io.StringIO(text, newline=None))
+    model, accessui = split_description(result.title)
+    primary_language, languages = language_summary(result)
+    if not model:
+        # Untitled outputs fall back to their file name
+        model = os.path.splitext(os.path.basename(path))[0]
+    row = {
+        'model': model,
+        'accessui': accessui,
+        'charcount': result.char_count,
+        'codechars': result.code_char_count,
+        'codepercent': f"{result.code_percentage:.2f}",
+        'codeblocks': result.code_blocks,
+        'output_number': output_number(path),
+        'primarylanguage': primary_language,
+        'languages': languages,
+    }
+    row.update(python_metrics(path, timeout, text) if python else timed_out_metrics())
+    return row
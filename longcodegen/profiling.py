@@ -0,0 +1,326 @@
+"""Timing spans around the dashboards' load and render steps.
+
+    with span('charts.render_bar_chart'):
+        ...
+
+    @profiled('data.load_evaluations')
+    def load_evaluations(path): ...
+
+Profiling is off unless LONGCODEGEN_PROFILE=1 is set (or enable() is
+called); while it is off a span is a shared no-op object and a profiled
+function costs one flag check per call. When it is on, every finished span
+is:
+
+- added to the current run, the spans of one Streamlit rerun or one Gradio
+  event, which the apps' debug panels show;
+- added to a per-step histogram exported in the Prometheus text format,
+  written to LONGCODEGEN_METRICS_FILE and/or served on
+  LONGCODEGEN_METRICS_PORT at /metrics;
+- logged as one JSON object per line to LONGCODEGEN_PROFILE_LOG, if set.
+
+Spans nest: a span started inside another records its depth, so a run
+reads as a tree of steps. The current run and depth are context variables,
+so work an async handler hands to asyncio.to_thread() is still counted in
+the handler's run.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from itertools import count
+
+from longcodegen.cache import named_caches
+
+# Upper bounds of the Prometheus histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_RUNS = 20
+# Minimum seconds between rewrites of the metrics file
+METRICS_FILE_INTERVAL = 1.0
+
+logger = logging.getLogger('longcodegen.profiling')
+
+_enabled = os.environ.get('LONGCODEGEN_PROFILE', '').lower() in ('1', 'true', 'yes')
+_current_run = contextvars.ContextVar('longcodegen_profiling_run', default=None)
+_depth = contextvars.ContextVar('longcodegen_profiling_depth', default=0)
+_lock = threading.Lock()
+_histograms = {}  # span name -> [bucket counts..., +Inf count, sum]
+_runs = deque(maxlen=RECENT_RUNS)
+_run_ids = count(1)
+_metrics_file = None
+_metrics_written = 0.0
+_server = None
+
+
+def enabled():
+    return _enabled
+
+
+def enable(log_path=None, metrics_file=None, metrics_port=None):
+    """Turn profiling on and set up the exports not configured by environment variables."""
+    global _enabled, _metrics_file
+    _enabled = True
+    if log_path and not any(getattr(handler, 'baseFilename', None) == os.path.abspath(log_path)
+                            for handler in logger.handlers):
+        handler = logging.FileHandler(log_path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if metrics_file:
+        _metrics_file = metrics_file
+    if metrics_port:
+        try:
+            serve_metrics(int(metrics_port))
+        except OSError as error:
+            logger.warning(f"Could not serve metrics on port {metrics_port}: {error}")
+
+
+def configure():
+    """Apply the LONGCODEGEN_PROFILE* and LONGCODEGEN_METRICS_* environment variables; safe to call on every rerun."""
+    if _enabled:
+        enable(os.environ.get('LONGCODEGEN_PROFILE_LOG'), os.environ.get('LONGCODEGEN_METRICS_FILE'),
+               os.environ.get('LONGCODEGEN_METRICS_PORT'))
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+class Run:
+    """The spans recorded between start_run() and finish_run() in one context."""
+
+    def __init__(self, name):
+        self.name = name
+        self.id = next(_run_ids)
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []  # (name, depth, start offset, seconds), in start order
+        self.tokens = None
+
+
+class _Span:
+    __slots__ = ('name', 'start', 'depth', 'index', 'run', 'token')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.depth = _depth.get()
+        self.token = _depth.set(self.depth + 1)
+        self.run = _current_run.get()
+        self.start = time.perf_counter()
+        if self.run is not None:
+            # Reserve the slot now so parents are listed before their children
+            self.index = len(self.run.spans)
+            self.run.spans.append(None)
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        _depth.reset(self.token)
+        if self.run is not None:
+            self.run.spans[self.index] = (self.name, self.depth, self.start - self.run.start, seconds)
+        _record(self.name, seconds, self.depth, self.run)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing the enclosed block under name."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def profiled(name):
+    """Decorator timing every call of a function under name."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with _Span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profiled_run(name):
+    """Decorator recording every call of an event handler as its own Run."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                run = start_run(name)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    finish_run(run)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            run = start_run(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish_run(run)
+        return wrapper
+    return decorator
+
+
+def start_run(name):
+    """Start collecting the spans of this context into a new Run (None while profiling is off)."""
+    if not _enabled:
+        return None
+    run = Run(name)
+    run.tokens = (_current_run.set(run), _depth.set(0))
+    return run
+
+
+def finish_run(run):
+    if run is None:
+        return
+    run.duration = time.perf_counter() - run.start
+    if _current_run.get() is run:
+        _current_run.reset(run.tokens[0])
+        _depth.reset(run.tokens[1])
+    _record(run.name, run.duration, -1, run)
+    with _lock:
+        _runs.append(run)
+
+
+def recent_runs(limit=RECENT_RUNS):
+    """The last finished runs, newest first."""
+    with _lock:
+        return list(_runs)[-limit:][::-1]
+
+
+def run_steps(run):
+    """(step name indented by depth, milliseconds) of the finished spans of run, in start order."""
+    return [('\u2003' * depth + name, seconds * 1000) for name, depth, _, seconds in filter(None, run.spans)]
+
+
+def _record(name, seconds, depth, run):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+    if logger.handlers:
+        logger.info(json.dumps({'ts': round(time.time(), 6), 'span': name, 'ms': round(seconds * 1000, 3),
+                                'depth': depth, 'run': run.id if run else None,
+                                'thread': threading.current_thread().name}))
+    if depth <= 0:
+        _write_metrics_file()
+
+
+def cache_stats():
+    """(name, hits, misses, hit rate or None, entries) of every named cache."""
+    stats = []
+    for name, cache in named_caches().items():
+        lookups = cache.hits + cache.misses
+        stats.append((name, cache.hits, cache.misses, cache.hits / lookups if lookups else None, len(cache)))
+    return stats
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """Span histograms and cache counters in the Prometheus text exposition format."""
+    lines = ['# HELP longcodegen_span_seconds Time spent in instrumented load and render steps.',
+             '# TYPE longcodegen_span_seconds histogram']
+    with _lock:
+        histograms = {name: list(values) for name, values in sorted(_histograms.items())}
+    for name, values in histograms.items():
+        label = _label(name)
+        for bound, value in zip(BUCKETS, values):
+            lines.append(f'longcodegen_span_seconds_bucket{{span="{label}",le="{bound}"}} {value}')
+        lines.append(f'longcodegen_span_seconds_bucket{{span="{label}",le="+Inf"}} {values[len(BUCKETS)]}')
+        lines.append(f'longcodegen_span_seconds_sum{{span="{label}"}} {values[-1]:.6f}')
+        lines.append(f'longcodegen_span_seconds_count{{span="{label}"}} {values[len(BUCKETS)]}')
+
+    stats = cache_stats()
+    for metric, kind, help_text, column in (
+            ('longcodegen_cache_hits_total', 'counter', 'Lookups answered from an in-process cache.', 1),
+            ('longcodegen_cache_misses_total', 'counter', 'Lookups that missed an in-process cache.', 2),
+            ('longcodegen_cache_entries', 'gauge', 'Entries held by an in-process cache.', 4)):
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{{cache="{_label(stat[0])}"}} {stat[column]}' for stat in stats]
+    return '\n'.join(lines) + '\n'
+
+
+def _write_metrics_file():
+    global _metrics_written
+    if not _metrics_file or time.monotonic() - _metrics_written < METRICS_FILE_INTERVAL:
+        return
+    from longcodegen.manifest import atomic_write
+
+    _metrics_written = time.monotonic()
+    text = prometheus_text()
+    try:
+        atomic_write(_metrics_file, lambda file: file.write(text))
+    except OSError as error:
+        logger.warning(f"Could not write {_metrics_file}: {error}")
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Serve prometheus_text() at http://host:port/metrics from a daemon thread (once per process)."""
+    global _server
+    if _server is not None:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, name='longcodegen-metrics', daemon=True).start()
+    return _server
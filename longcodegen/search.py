@@ -0,0 +1,259 @@
+"""Full-text search over the outputs, backed by SQLite FTS5.
+
+Each output is stored as one document with its prose and its code-fence
+content in separate columns, so a query can target either or both. The
+index remembers every file's size and mtime and update() only re-reads
+files that changed, which keeps it cheap to refresh after every ingest.
+
+Queries are plain words and "quoted phrases"; all of them must match, and a
+trailing * makes a word a prefix. Matches come back with an HTML snippet
+where the hits are wrapped in <mark>. They are ranked with BM25 unless more
+than RANKED_MATCHES documents match: scoring every match of a very common
+term would take hundreds of milliseconds on a large corpus, so those queries
+list the most recently indexed outputs first instead.
+"""
+import csv
+import hashlib
+import html
+import io
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from longcodegen.archive import read_member
+from longcodegen.cache import file_version
+from longcodegen.fences import FenceScanner
+from longcodegen.manifest import Manifest, manifest_path
+from longcodegen.metrics import number_outputs, output_number
+from longcodegen.profiling import profiled
+from longcodegen.storage import open_storage, output_stat
+
+SCOPES = ('all', 'prose', 'code')
+RANKED_MATCHES = 1000
+
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+# Snippet markers that can't occur in the text, swapped for <mark> after escaping
+_HIT_START, _HIT_END = '\x02', '\x03'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    docid INTEGER NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    accessui TEXT NOT NULL DEFAULT ''
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    prose, code, tags, path UNINDEXED, model UNINDEXED, accessui UNINDEXED
+);
+"""
+# The tags column only holds filter tokens, so it mustn't affect ranking
+_RANK_CONFIG = "INSERT INTO documents (documents, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')"
+
+
+@dataclass
+class SearchHit:
+    path: str
+    model: str
+    accessui: str
+    snippet: str
+
+
+def split_prose_and_code(path):
+    """Return (prose, code) of an output, without the fence lines."""
+    scanner = FenceScanner()
+    prose, code = [], []
+    for line in io.StringIO(read_member(path), newline=None):
+        kind = scanner.feed(line)
+        if kind == 'text':
+            prose.append(line)
+        elif kind == 'code':
+            code.append(line)
+    return ''.join(prose), ''.join(code)
+
+
+def build_match(query, scope='all'):
+    """Translate a user query into an FTS5 MATCH expression, or None if it's empty.
+
+    Every word and phrase is quoted, so FTS5 operators typed by the user are
+    searched for literally instead of raising syntax errors.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown search scope: {scope}")
+    terms = []
+    for phrase, word in _QUERY_TOKEN_RE.findall(query):
+        text = phrase if phrase else word
+        prefix = not phrase and len(word) > 1 and word.endswith('*')
+        text = text.rstrip('*') if prefix else text
+        if text.strip():
+            terms.append('"' + text.replace('"', '""') + '"' + ('*' if prefix else ''))
+    if not terms:
+        return None
+    columns = 'prose code' if scope == 'all' else scope
+    return f"{{{columns}}} : ({' AND '.join(terms)})"
+
+
+def _tag(kind, value):
+    """Single-token stand-in for a model or access UI, so filters are index lookups."""
+    return kind + hashlib.sha1(value.encode('utf-8')).hexdigest()[:16]
+
+
+def _tags(model, accessui):
+    return f"{_tag('m', model)} {_tag('u', accessui)}"
+
+
+def _highlight(snippet):
+    return html.escape(snippet).replace(_HIT_START, '<mark>').replace(_HIT_END, '</mark>')
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+            connection.execute(_RANK_CONFIG)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the index safe to use from
+        # the dashboards' request threads
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def update(self, paths, labels=None):
+        """Index new or changed files and drop files that are no longer listed.
+
+        labels maps a path to its (model, accessui); a label change alone
+        doesn't re-read the file. Returns (updated, removed) counts.
+        """
+        labels = labels or {}
+        paths = [os.path.abspath(path) for path in paths]
+        labels = {os.path.abspath(path): label for path, label in labels.items()}
+        updated = 0
+        with self._connect() as connection:
+            known = {row[0]: row[1:] for row in connection.execute(
+                "SELECT path, size, mtime_ns, docid, model, accessui FROM files")}
+            for path in paths:
+                stat = output_stat(path)
+                model, accessui = labels.get(path, ('', ''))
+                entry = known.get(path)
+                if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                    if entry[3:] != (model, accessui):
+                        connection.execute("UPDATE documents SET tags = ?, model = ?, accessui = ? WHERE rowid = ?",
+                                           (_tags(model, accessui), model, accessui, entry[2]))
+                        connection.execute("UPDATE files SET model = ?, accessui = ? WHERE path = ?",
+                                           (model, accessui, path))
+                    continue
+                if entry is not None:
+                    connection.execute("DELETE FROM documents WHERE rowid = ?", (entry[2],))
+                prose, code = split_prose_and_code(path)
+                docid = connection.execute(
+                    "INSERT INTO documents (prose, code, tags, path, model, accessui) VALUES (?, ?, ?, ?, ?, ?)",
+                    (prose, code, _tags(model, accessui), path, model, accessui)).lastrowid
+                connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                                   (path, stat.st_size, stat.st_mtime_ns, docid, model, accessui))
+                updated += 1
+
+            listed = set(paths)
+            removed = [(path, entry[2]) for path, entry in known.items() if path not in listed]
+            for path, docid in removed:
+                connection.execute("DELETE FROM documents WHERE rowid = ?", (docid,))
+                connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        return updated, len(removed)
+
+    def facets(self):
+        """Distinct models and access UIs, for filter widgets."""
+        with self._connect() as connection:
+            models = [row[0] for row in connection.execute("SELECT DISTINCT model FROM files WHERE model != '' ORDER BY model")]
+            accessuis = [row[0] for row in connection.execute("SELECT DISTINCT accessui FROM files WHERE accessui != '' ORDER BY accessui")]
+        return models, accessuis
+
+    @profiled('search.query')
+    def search(self, query, scope='all', models=None, accessuis=None, limit=20):
+        """Best matches for query, optionally restricted to some models and access UIs."""
+        match = build_match(query, scope)
+        if match is None:
+            return []
+        # Filters are matched as tag tokens, which FTS5 intersects with the
+        # query's posting lists instead of checking every matching row
+        for kind, values in (('m', models), ('u', accessuis)):
+            if values:
+                match += " AND {tags} : (" + ' OR '.join(_tag(kind, value) for value in values) + ")"
+        column = {'all': -1, 'prose': 0, 'code': 1}[scope]
+        with self._connect() as connection:
+            matches = connection.execute("SELECT count(*) FROM (SELECT 1 FROM documents WHERE documents MATCH ? LIMIT ?)",
+                                         (match, RANKED_MATCHES + 1)).fetchone()[0]
+            order = "rank" if matches <= RANKED_MATCHES else "rowid DESC"
+            rows = connection.execute(
+                f"SELECT path, model, accessui, snippet(documents, {column}, ?, ?, ' … ', 16) "
+                f"FROM documents WHERE documents MATCH ? ORDER BY {order} LIMIT ?",
+                (_HIT_START, _HIT_END, match, limit)).fetchall()
+        return [SearchHit(path, model, accessui, _highlight(snippet)) for path, model, accessui, snippet in rows]
+
+
+def output_numbers(paths, evaluations_path=None):
+    """output_number of each path's row in the evaluations table.
+
+    outputN.md is row N. Other files keep the number recorded for them in
+    the table's manifest (from calculator.py --incremental), if there is
+    one, and are otherwise numbered as calculator.py numbers them.
+    """
+    numbers = [output_number(path) for path in paths]
+    if evaluations_path and os.path.exists(manifest_path(evaluations_path)):
+        manifest = Manifest(manifest_path(evaluations_path))
+        for i, path in enumerate(paths):
+            row = manifest.row(manifest.key(path)) if numbers[i] is None else None
+            if row is not None:
+                numbers[i] = row['output_number']
+    return number_outputs(numbers)
+
+
+def output_labels(paths, rows, numbers=None):
+    """Map paths to the (model, accessui) of their evaluations row.
+
+    numbers are the rows' output_numbers in the order of paths, by default
+    output_numbers(paths). Ingest and the dashboards both label outputs
+    through here, so filters match whatever wrote the index.
+    """
+    by_number = {int(row['output_number']): (row['model'], row['accessui']) for row in rows}
+    if numbers is None:
+        numbers = output_numbers(paths)
+    return {path: by_number[int(number)] for path, number in zip(paths, numbers) if int(number) in by_number}
+
+
+_index_versions = {}
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+@profiled('search.open_index')
+def open_index(index_path, folder, evaluations_path):
+    """SearchIndex over a folder or archive of outputs, brought up to date when it or the evaluations table changed.
+
+    Ingest normally keeps the index current; this catches outputs added or
+    removed since, at the cost of two stat() calls per query.
+    """
+    manifest = manifest_path(evaluations_path)
+    version = (file_version(folder), file_version(evaluations_path),
+               file_version(manifest) if os.path.exists(manifest) else None)
+    with _index_lock:
+        # Creating a SearchIndex writes the schema, so it is done once per process
+        index = _indexes.get(index_path)
+        if index is None:
+            index = _indexes[index_path] = SearchIndex(index_path)
+        if _index_versions.get(index_path) != version:
+            with open(evaluations_path, 'r', newline='', encoding='utf-8') as csvfile:
+                rows = list(csv.DictReader(csvfile))
+            storage = open_storage(folder)
+            paths = [storage.path_of(name) for name in storage.names()]
+            index.update(paths, output_labels(paths, rows, output_numbers(paths, evaluations_path)))
+            _index_versions[index_path] = version
+    return index
@@ -0,0 +1,159 @@
+"""Split long outputs into sections that can be rendered one at a time.
+
+An output is indexed once into sections that start at headings and at code
+fences, with byte offsets into the file. Viewers render the first few
+sections and read the rest from disk only when they are asked for, so the
+time to first paint doesn't depend on the size of the output. Sections that
+grow past MAX_SECTION_BYTES are split at line boundaries so that a single
+huge code block can still be shown piecemeal.
+
+Outputs inside a packed archive are addressed as <archive>/<name> and read
+from the archive.
+"""
+import io
+import re
+from dataclasses import dataclass
+
+from longcodegen.archive import open_archive, split_member
+from longcodegen.cache import memoize_file
+from longcodegen.fences import FenceScanner
+from longcodegen.profiling import profiled
+
+MAX_SECTION_BYTES = 32 * 1024
+# How much a viewer renders per page
+PAGE_BYTES = 64 * 1024
+
+HEADING_RE = re.compile(r'^ {0,3}#{1,6}\s+(.*?)\s*#*\s*$')
+
+
+@dataclass
+class Section:
+    title: str
+    kind: str  # 'text' or 'code'
+    start: int
+    end: int
+    language: str = ''
+    line: int = 0
+    heading: bool = False
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+
+class _SectionBuilder:
+    def __init__(self):
+        self.sections = []
+        self.current = None
+
+    def start(self, title, kind, offset, line, language='', heading=False):
+        self.finish(offset)
+        self.current = Section(title=title, kind=kind, start=offset, end=offset, language=language, line=line,
+                               heading=heading)
+
+    def extend(self, title, kind, offset, line, language=''):
+        """Continue the current section, splitting it once it grows too big."""
+        if self.current is None:
+            self.start(title, kind, offset, line, language)
+        elif offset - self.current.start >= MAX_SECTION_BYTES:
+            self.start(title + " (cont.)", kind, offset, line, language)
+
+    def finish(self, offset):
+        if self.current is not None:
+            self.current.end = offset
+            if self.current.size > 0:
+                self.sections.append(self.current)
+            self.current = None
+
+
+def load_sections(path):
+    """Section index of an output, cached until the file (or archive) changes.
+
+    Code sections cover the block body only, without its fence lines.
+    """
+    member = split_member(path)
+    return _load_member_sections(*member) if member else _load_file_sections(path)
+
+
+@memoize_file(maxsize=64)
+def _load_file_sections(path):
+    with open(path, 'rb') as file:
+        return build_sections(file)
+
+
+@memoize_file(maxsize=64)
+def _load_member_sections(archive_path, name):
+    return build_sections(io.BytesIO(open_archive(archive_path).read_bytes(name)))
+
+
+@profiled('sections.build_sections')
+def build_sections(raw_lines):
+    """Sections of an output given as an iterable of byte lines."""
+    scanner = FenceScanner()
+    builder = _SectionBuilder()
+    heading = "Introduction"
+    code_title, language = "Code", ''
+    offset = 0
+    for number, raw in enumerate(raw_lines, start=1):
+        line = raw.decode('utf-8', errors='replace')
+        kind = scanner.feed(line)
+        if kind == 'open':
+            builder.finish(offset)
+            language = scanner.open_block.language
+            code_title = f"Code ({language})" if language else "Code"
+        elif kind == 'code':
+            builder.extend(code_title, 'code', offset, number, language)
+        elif kind == 'close':
+            builder.finish(offset)
+        else:
+            match = HEADING_RE.match(line)
+            if match:
+                heading = match.group(1).strip('*_ ') or heading
+                builder.start(heading, 'text', offset, number, heading=True)
+            elif line.strip() or builder.current is not None:
+                builder.extend(heading, 'text', offset, number)
+        offset += len(raw)
+    builder.finish(offset)
+    return builder.sections
+
+
+@profiled('sections.read_section')
+def read_section(path, section):
+    """Text of one section, read straight from its byte range."""
+    member = split_member(path)
+    if member:
+        data = open_archive(member[0]).read_bytes(member[1])[section.start:section.end]
+    else:
+        with open(path, 'rb') as file:
+            file.seek(section.start)
+            data = file.read(section.size)
+    return data.decode('utf-8', errors='replace').replace('\r\n', '\n')
+
+
+def page_of_sections(sections, first, pages=1):
+    """Indices of the sections to render from first, within pages * PAGE_BYTES.
+
+    At least one section is always included, however large it is.
+    """
+    budget = pages * PAGE_BYTES
+    chosen = []
+    used = 0
+    for index in range(first, len(sections)):
+        if chosen and used + sections[index].size > budget:
+            break
+        chosen.append(index)
+        used += sections[index].size
+    return chosen
+
+
+def outline(sections):
+    """(label, section index) pairs for a 'jump to section' list.
+
+    Only sections that open with a heading are listed, plus the start of the
+    output, which keeps the list short for outputs with many code blocks.
+    """
+    entries = [(f"{section.title} (line {section.line})", index)
+               for index, section in enumerate(sections) if section.heading]
+    if sections and (not entries or entries[0][1] != 0):
+        entries.insert(0, (f"Start (line {sections[0].line})", 0))
+    return entries
@@ -0,0 +1,233 @@
+"""Near-duplicate detection for outputs with MinHash and LSH.
+
+Each output is reduced to a MinHash signature of its word shingles: NUM_PERM
+minimums of independently hashed shingles. The fraction of positions at
+which two signatures agree estimates the Jaccard similarity of the outputs'
+shingle sets. Signatures are computed once per output version, in a process
+pool for large corpora. Outputs can be files or members of a packed archive.
+
+Finding similar outputs doesn't compare every pair: the signatures are cut
+into BANDS bands and only outputs that share an identical band become
+candidates. With 32 bands of 4 rows, pairs above roughly 0.4 similarity are
+very likely to collide while dissimilar pairs almost never do, so the work
+grows with the number of outputs and similar pairs rather than quadratically.
+Outputs without a single word have no shingles and are similar to nothing.
+
+numpy is imported on first use so the dashboards don't load it at startup.
+"""
+import functools
+import os
+import re
+import zlib
+from collections import defaultdict
+from multiprocessing import Pool
+
+from longcodegen.archive import read_member
+from longcodegen.cache import LRUCache, file_version
+from longcodegen.profiling import profiled
+from longcodegen.storage import open_storage, output_stat
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_WORDS = 5
+# Shingles hashed per step, which bounds memory for very long outputs
+_BLOCK = 4096
+# Candidate pairs compared per step; gathering millions at once would take gigabytes
+_PAIR_STEP = 65536
+_SEED = 20241210
+
+# Every position of the signature of an output without shingles
+_EMPTY = 0xFFFFFFFF
+
+_TOKEN_RE = re.compile(r'\w+')
+_matrices = LRUCache(maxsize=4, name='similarity.model_similarity')
+_folder_pairs = LRUCache(maxsize=4, name='similarity.similar_outputs')
+_signatures = LRUCache(maxsize=65536, name='similarity.signatures')
+
+
+@functools.lru_cache(maxsize=None)
+def _permutations():
+    """(a, b) of the NUM_PERM multiply-shift hash functions; a is odd."""
+    import numpy as np
+
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+def shingle_hashes(text, size=SHINGLE_WORDS):
+    """Distinct 64-bit hashes of the text's lowercased word n-grams."""
+    import numpy as np
+
+    tokens = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in _TOKEN_RE.findall(text.lower())),
+                         dtype=np.uint64)
+    if len(tokens) == 0:
+        return tokens
+    size = min(size, len(tokens))
+    count = len(tokens) - size + 1
+    # Polynomial hash of each window; uint64 arithmetic wraps around
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * np.uint64(1099511628211) + tokens[offset:offset + count]
+    return np.unique(hashes)
+
+
+def minhash(hashes):
+    """MinHash signature (NUM_PERM uint32 values) of a set of shingle hashes."""
+    import numpy as np
+
+    a, b = _permutations()
+    signature = np.full(NUM_PERM, _EMPTY, dtype=np.uint64)
+    for start in range(0, len(hashes), _BLOCK):
+        block = hashes[None, start:start + _BLOCK]
+        np.minimum(signature, ((a * block + b) >> np.uint64(32)).min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def file_signature(path):
+    return minhash(shingle_hashes(read_member(path)))
+
+
+def signatures(paths, workers=None, chunksize=64):
+    """Signature matrix (one row per path), computing uncached ones in a process pool."""
+    import numpy as np
+
+    rows = [None] * len(paths)
+    versions = [output_stat(path) for path in paths]
+    missing = []
+    for position, path in enumerate(paths):
+        cached = _signatures.get(os.path.abspath(path), version=versions[position])
+        if cached is None:
+            missing.append(position)
+        else:
+            rows[position] = cached
+    todo = [paths[position] for position in missing]
+    if workers == 1 or len(todo) <= 1:
+        computed = [file_signature(path) for path in todo]
+    else:
+        with Pool(processes=workers) as pool:
+            computed = list(pool.imap(file_signature, todo, chunksize=chunksize))
+    for position, signature in zip(missing, computed):
+        _signatures.put(os.path.abspath(paths[position]), signature, version=versions[position])
+        rows[position] = signature
+    return np.vstack(rows) if rows else np.empty((0, NUM_PERM), dtype=np.uint32)
+
+
+def has_shingles(matrix):
+    """Which signature rows belong to outputs with at least one shingle."""
+    return (matrix != _EMPTY).any(axis=1)
+
+
+def candidate_pairs(matrix, bands=BANDS):
+    """Index pairs (i, j), i < j, whose signatures are identical in at least one band.
+
+    Outputs without shingles are left out: their signatures are all
+    identical, so they would share every bucket and all be compared.
+    """
+    import numpy as np
+
+    rows_per_band = matrix.shape[1] // bands
+    positions = np.flatnonzero(has_shingles(matrix)).tolist()
+    pairs = set()
+    for band in range(bands):
+        keys = np.ascontiguousarray(matrix[positions, band * rows_per_band:(band + 1) * rows_per_band])
+        buckets = defaultdict(list)
+        for position, key in zip(positions, keys.view(f'V{keys.dtype.itemsize * rows_per_band}').ravel()):
+            buckets[key.tobytes()].append(position)
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                pairs.update((first, second) for second in members[i + 1:])
+    return sorted(pairs)
+
+
+def estimated_similarity(matrix, pairs):
+    """Estimated Jaccard similarity of each pair of signature rows."""
+    import numpy as np
+
+    if not pairs:
+        return np.empty(0)
+    first, second = np.array(pairs).T
+    return np.concatenate([(matrix[first[start:start + _PAIR_STEP]] == matrix[second[start:start + _PAIR_STEP]]).mean(axis=1)
+                           for start in range(0, len(first), _PAIR_STEP)])
+
+
+def near_duplicates(paths, threshold=0.5, workers=None):
+    """(path, path, similarity) of every pair above threshold, most similar first."""
+    matrix = signatures(paths, workers)
+    pairs = candidate_pairs(matrix)
+    scores = estimated_similarity(matrix, pairs)
+    found = [(paths[i], paths[j], float(score)) for (i, j), score in zip(pairs, scores) if score >= threshold]
+    return sorted(found, key=lambda pair: -pair[2])
+
+
+@profiled('similarity.similar_outputs')
+def similar_outputs(folder, threshold=0.5):
+    """near_duplicates() of the outputs in a folder or archive, for the dashboards.
+
+    Every LSH candidate is scored once per version of the folder, so
+    changing the threshold only filters the cached pairs.
+    """
+    version = file_version(folder)
+    key = os.path.abspath(folder)
+    scored = _folder_pairs.get(key, version=version)
+    if scored is None:
+        storage = open_storage(folder)
+        paths = [storage.path_of(name) for name in storage.names()]
+        scored = near_duplicates(paths, 0.0, workers=1)
+        _folder_pairs.put(key, scored, version=version)
+    return [pair for pair in scored if pair[2] >= threshold]
+
+
+def similarity_matrix(matrix):
+    """All-pairs estimated similarity of a (small) group of signatures.
+
+    Outputs without shingles score 0 against every output.
+    """
+    import numpy as np
+
+    if not len(matrix):
+        return np.empty((0, 0))
+    scores = np.stack([(matrix == row).mean(axis=1) for row in matrix])
+    empty = ~has_shingles(matrix)
+    scores[empty, :] = 0
+    scores[:, empty] = 0
+    return scores
+
+
+@profiled('similarity.model_similarity')
+def model_similarity(folder, evaluations_path):
+    """{model: DataFrame} of pairwise similarity between that model's outputs.
+
+    Only models with more than one output are included. Rows and columns are
+    labelled with the output file and access UI. Cached until the folder or
+    the evaluations table changes.
+    """
+    import pandas as pd
+
+    from longcodegen.data import load_evaluations
+    from longcodegen.search import output_labels, output_numbers
+
+    version = (file_version(folder), file_version(evaluations_path))
+    key = (os.path.abspath(folder), os.path.abspath(evaluations_path))
+    matrices = _matrices.get(key, version=version)
+    if matrices is not None:
+        return matrices
+
+    storage = open_storage(folder)
+    paths = [storage.path_of(name) for name in storage.names()]
+    labels = output_labels(paths, load_evaluations(evaluations_path).to_dict('records'),
+                           output_numbers(paths, evaluations_path))
+    groups = defaultdict(list)
+    for path in paths:
+        if path in labels:
+            groups[labels[path][0]].append(path)
+
+    matrices = {}
+    for model, members in sorted(groups.items()):
+        if len(members) < 2:
+            continue
+        names = [f"{os.path.splitext(os.path.basename(path))[0]} ({labels[path][1]})" for path in members]
+        matrices[model] = pd.DataFrame(similarity_matrix(signatures(members, workers=1)), index=names, columns=names)
+    _matrices.put(key, matrices, version=version)
+    return matrices
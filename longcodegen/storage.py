@@ -0,0 +1,106 @@
+"""Where a corpus keeps its outputs: a folder of .md files or a packed archive.
+
+Both backends answer the same questions, so loaders, indexes and front ends
+read outputs the same way whatever is on disk:
+
+    storage = open_storage('app/data/outputs')   # or app/data/outputs.lcgpack
+    for name in storage.names():                 # output2.md before output10.md
+        text = storage.read_text(name)
+
+An output can also be addressed by path, <folder or archive>/<name>, as
+paths handed between modules and to worker processes are; locate() turns
+such a path back into (storage, name).
+"""
+import io
+import os
+from collections import namedtuple
+
+from longcodegen.archive import EXTENSION, is_archive, open_archive
+from longcodegen.cache import file_version
+from longcodegen.metrics import list_outputs
+
+# The fields of os.stat_result that change detection looks at
+OutputStat = namedtuple('OutputStat', 'st_size st_mtime_ns')
+
+
+class _Storage:
+    packed = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def path_of(self, name):
+        return os.path.join(self.path, name)
+
+    def read_text(self, name):
+        return self.read_bytes(name).decode('utf-8', errors='replace')
+
+    def version(self):
+        """Change marker of the whole store: a folder's changes when outputs are added, removed or renamed."""
+        return file_version(self.path)
+
+
+class FolderStorage(_Storage):
+    def names(self):
+        """Output file names in natural order."""
+        return list_outputs(self.path)
+
+    def stat(self, name):
+        stat = os.stat(self.path_of(name))
+        return OutputStat(stat.st_size, stat.st_mtime_ns)
+
+    def open(self, name):
+        """Binary file object of one output."""
+        return open(self.path_of(name), 'rb')
+
+    def read_bytes(self, name):
+        with self.open(name) as file:
+            return file.read()
+
+
+class ArchiveStorage(_Storage):
+    packed = True
+
+    @property
+    def archive(self):
+        # Re-opened once whenever the archive file is replaced
+        return open_archive(self.path)
+
+    def names(self):
+        return self.archive.names()
+
+    def stat(self, name):
+        entry = self.archive.entries.get(name)
+        if entry is None:
+            raise FileNotFoundError(f"No output {name} in {self.path}")
+        return OutputStat(entry.size, entry.mtime_ns)
+
+    def open(self, name):
+        return io.BytesIO(self.read_bytes(name))
+
+    def read_bytes(self, name):
+        return self.archive.read_bytes(name)
+
+
+def open_storage(path):
+    """The backend for a folder of outputs or a packed archive."""
+    return ArchiveStorage(path) if is_archive(path) else FolderStorage(path)
+
+
+def locate(path):
+    """(storage, name) of an output given as <folder>/<name> or <archive>/<name>."""
+    folder, name = os.path.split(path)
+    return open_storage(folder), name
+
+
+def output_stat(path):
+    """OutputStat of one output, inside a folder or an archive."""
+    storage, name = locate(path)
+    return storage.stat(name)
+
+
+def resolve_outputs(path):
+    """path, or the packed archive next to it (path + .lcgpack) when path doesn't exist."""
+    if not os.path.exists(path) and os.path.exists(path + EXTENSION):
+        return path + EXTENSION
+    return path
@@ -0,0 +1,120 @@
+"""Syntax and structure metrics for the Python code in an output.
+
+Every block tagged as Python is parsed with ast. An output is summarised by
+how many of its Python blocks parse, and by the functions, classes, imported
+names and lines they contain. Parsing is bounded by a per-file time limit,
+because a pathological generation shouldn't stall a whole scoring run; an
+output that runs out of time is reported with status 'timeout' and no
+counts.
+
+time_limit() below can only interrupt Python code between bytecodes, and a
+single ast.parse() call runs in C, so it is not enough on its own: the
+calculator also runs scoring in worker processes with a deadline and
+replaces a worker that overruns it (see run_pool in calculator.py).
+"""
+import ast
+import io
+import signal
+import threading
+from contextlib import contextmanager
+
+from longcodegen.fences import FenceScanner
+
+SYNTAX_COLUMNS = ['pyblocks', 'pyparsed', 'pyfunctions', 'pyclasses', 'pyimports', 'pylines', 'pystatus']
+PYTHON_LANGUAGES = {'python', 'python3', 'py', 'py3'}
+# Seconds allowed per output
+SYNTAX_TIMEOUT = 10
+
+
+class SyntaxTimeout(Exception):
+    pass
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raise SyntaxTimeout if the block takes longer than seconds.
+
+    Uses SIGALRM, so the limit only applies on Unix and in the main thread,
+    which is where pool workers run their tasks; elsewhere it is a no-op.
+    The signal is handled between bytecodes, so it can't stop a long call
+    into C such as ast.parse() of a huge block.
+    """
+    if not seconds or not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise SyntaxTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def analyze_source(source):
+    """(parsed, functions, classes, imports) of one block of Python source."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return False, 0, 0, 0
+    functions = classes = imports = 0
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions += 1
+        elif isinstance(node, ast.ClassDef):
+            classes += 1
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports += len(node.names)
+    return True, functions, classes, imports
+
+
+def python_blocks(lines):
+    """Source of every block tagged as Python, one string per block."""
+    scanner = FenceScanner()
+    blocks = []
+    for line in lines:
+        kind = scanner.feed(line)
+        if kind == 'open' and scanner.open_block.language.lower() in PYTHON_LANGUAGES:
+            blocks.append([])
+        elif kind == 'code' and blocks and scanner.open_block.language.lower() in PYTHON_LANGUAGES:
+            blocks[-1].append(line)
+    return [''.join(block) for block in blocks]
+
+
+def timed_out_metrics():
+    """Row values for SYNTAX_COLUMNS of an output that ran out of time."""
+    row = dict.fromkeys(SYNTAX_COLUMNS[:-1], '')
+    row['pystatus'] = 'timeout'
+    return row
+
+
+def python_metrics(path, timeout=SYNTAX_TIMEOUT, text=None):
+    """Row values for SYNTAX_COLUMNS, read from path unless text is given.
+
+    pystatus is 'ok', 'none' when the output has no Python blocks, or
+    'timeout', in which case the counts are left empty.
+    """
+    row = dict.fromkeys(SYNTAX_COLUMNS[:-1], 0)
+    try:
+        with time_limit(timeout):
+            if text is None:
+                with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                    sources = python_blocks(file)
+            else:
+                sources = python_blocks(io.StringIO(text, newline=None))
+            for source in sources:
+                parsed, functions, classes, imports = analyze_source(source)
+                row['pyblocks'] += 1
+                row['pyparsed'] += parsed
+                row['pyfunctions'] += functions
+                row['pyclasses'] += classes
+                row['pyimports'] += imports
+                row['pylines'] += len(source.splitlines())
+        row['pystatus'] = 'ok' if sources else 'none'
+    except SyntaxTimeout:
+        row = timed_out_metrics()
+    return row
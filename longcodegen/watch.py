@@ -0,0 +1,101 @@
+"""Wait for output folders to change, with debouncing.
+
+FolderWatcher.wait() blocks until .md files in the watched folders have been
+added, changed or removed, and then until the folders have been quiet for
+`debounce` seconds, so a burst of a thousand arriving files wakes the caller
+once. `max_wait` bounds the delay when files keep trickling in.
+
+Change events come from watchdog (inotify on Linux) when it is installed,
+and from polling the folders' file sizes and mtimes otherwise.
+"""
+import os
+import threading
+import time
+
+# watchdog also reports files being opened and read, including by ingest itself
+_CHANGE_EVENTS = {'created', 'deleted', 'modified', 'moved', 'closed'}
+
+
+def folder_signature(folders):
+    """Snapshot of the .md files in folders: {path: (size, mtime_ns)}."""
+    signature = {}
+    for folder in folders:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.endswith('.md') and entry.is_file():
+                    stat = entry.stat()
+                    signature[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return signature
+
+
+class FolderWatcher:
+    def __init__(self, folders, interval=2.0, debounce=2.0, max_wait=30.0, use_events=True):
+        self.folders = list(folders)
+        self.interval = interval
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self._changed = threading.Event()
+        self._observer = self._start_observer() if use_events else None
+        self._signature = folder_signature(self.folders)
+
+    @property
+    def mode(self):
+        return 'events' if self._observer else 'polling'
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        changed = self._changed
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type not in _CHANGE_EVENTS:
+                    return
+                paths = [event.src_path, getattr(event, 'dest_path', '')]
+                if any(str(path).endswith('.md') for path in paths):
+                    changed.set()
+
+        observer = Observer()
+        for folder in self.folders:
+            observer.schedule(Handler(), folder, recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def _poll(self, timeout):
+        """True if the folders changed within timeout seconds."""
+        if self._observer:
+            changed = self._changed.wait(timeout)
+            self._changed.clear()
+            return changed
+        deadline = time.monotonic() + timeout
+        while True:
+            signature = folder_signature(self.folders)
+            if signature != self._signature:
+                self._signature = signature
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def wait(self, timeout=None):
+        """Block until a change has settled; False if timeout passed without one."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._poll(self.interval if deadline is None else min(self.interval, deadline - time.monotonic())):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+        first_change = time.monotonic()
+        while time.monotonic() - first_change < self.max_wait and self._poll(self.debounce):
+            pass
+        return True
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
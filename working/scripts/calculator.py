@@ -1,50 +1,396 @@
 import os
+import sys
 import csv
-import re
-
-# Hardcoded paths
-source_folder = "/home/daniel/Git/llm-long-codegen-test/app/data/outputs/prompt1-outputs"
-report_file = "/home/daniel/Git/llm-long-codegen-test/app/report.csv"
-
-# Ensure the report directory exists
-os.makedirs(os.path.dirname(report_file), exist_ok=True)
-
-# Check if the source folder exists
-if not os.path.exists(source_folder):
-    print(f"Source folder '{source_folder}' does not exist. Please check the path.")
-else:
-    # Process markdown files and update the CSV
-    with open(report_file, "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        # Write header
-        writer.writerow(["file-name", "description", "character-count", "code-character-count", "code-percentage", "number-of-code-blocks"])
-
-        for filename in os.listdir(source_folder):
-            if filename.endswith(".md"):
-                file_path = os.path.join(source_folder, filename)
-                file_name_without_suffix = os.path.splitext(filename)[0]
-
-                # Read the first line for description and count characters in the file
-                with open(file_path, "r", encoding="utf-8") as file:
-                    content = file.read()
-                    first_line = content.split('\n')[0].strip()
-                    if first_line.startswith("#"):
-                        description = first_line[1:].strip()
-                    else:
-                        description = first_line.strip()
-
-                    # Count total characters
-                    char_count = len(content)
-
-                    # Find all code blocks and count their characters and number of blocks
-                    code_blocks = re.findall(r"```(.*?)```", content, re.DOTALL)
-                    code_char_count = sum(len(code) for code in code_blocks)
-                    num_code_blocks = len(code_blocks)
-
-                    # Calculate code percentage
-                    code_percentage = (code_char_count / char_count) * 100 if char_count > 0 else 0
-
-                # Write to CSV
-                writer.writerow([file_name_without_suffix, description, char_count, code_char_count, f"{code_percentage:.2f}", num_code_blocks])
-
-    print(f"Report generated and saved to {report_file}")
\ No newline at end of file
+import hashlib
+import argparse
+import threading
+import time
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
+
+# Make the shared longcodegen package importable when run as a script
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, repo_root)
+
+from longcodegen.archive import is_archive, read_member, split_member
+from longcodegen.codeblocks import CodeBlockIndex, index_path
+from longcodegen.htmlcache import HTMLCache, cache_path
+from longcodegen.manifest import Manifest, atomic_write, file_sha256, manifest_path
+from longcodegen.metrics import EVALUATION_COLUMNS, number_outputs, score_file
+from longcodegen.storage import locate, open_storage, output_stat
+from longcodegen.syntax import SYNTAX_TIMEOUT
+from longcodegen.watch import FolderWatcher
+from longcodegen.search import SearchIndex, output_labels
+
+
+# Seconds a scoring task may run past --timeout before its worker is killed
+TASK_GRACE = 5
+
+
+def collect_paths(input_dirs):
+    """All .md files under the input directories, in a deterministic order.
+
+    An input can also be a packed archive, whose members are listed as
+    <archive>/<name>.
+    """
+    paths = []
+    for folder in input_dirs:
+        if not is_archive(folder) and not os.path.isdir(folder):
+            raise SystemExit(f"Source folder '{folder}' does not exist. Please check the path.")
+        storage = open_storage(folder)
+        paths.extend(storage.path_of(name) for name in storage.names())
+    return paths
+
+
+def run_pool(func, items, workers=None, chunksize=16, limit=None, expired=None):
+    """Map func over items with a process pool; results keep input order.
+
+    With a limit, every item runs in a worker process with a deadline of
+    limit seconds, even with one worker: a task stuck in C (a huge
+    ast.parse()) can't be interrupted, only killed. Items are still handed
+    out chunksize at a time, a chunk getting limit seconds per item. When a
+    chunk overruns, the pool is torn down and the chunk's items are run
+    again one at a time to find the stuck one; expired(item) stands in for
+    its result and the other unfinished chunks are run again in a fresh
+    pool.
+    """
+    if limit is None:
+        if workers == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with Pool(processes=workers) as pool:
+            return list(pool.imap(func, items, chunksize=chunksize))
+    workers = workers or os.cpu_count()
+    chunksize = max(chunksize, 1)
+    results = [None] * len(items)
+    pending = deque(tuple(range(start, min(start + chunksize, len(items))))
+                    for start in range(0, len(items), chunksize))
+    while pending:
+        stuck = run_with_deadline(func, items, pending, results, workers, limit)
+        if stuck is None:
+            continue
+        if len(stuck) > 1:
+            pending.extendleft((index,) for index in reversed(stuck))
+        else:
+            results[stuck[0]] = expired(items[stuck[0]])
+    return results
+
+
+def map_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def run_with_deadline(func, items, pending, results, workers, limit):
+    """Run pending chunks with at most one per worker in flight, so each starts when submitted.
+
+    Fills in results and returns None once pending is empty, or returns the
+    first chunk that overran its deadline, after putting the other
+    unfinished ones back on pending.
+    """
+    finished = threading.Event()
+    with Pool(processes=workers) as pool:  # terminate() on exit kills a stuck worker
+        running = {}
+        while pending or running:
+            while pending and len(running) < workers:
+                chunk = pending.popleft()
+                running[chunk] = (pool.apply_async(map_chunk, (func, [items[index] for index in chunk]),
+                                                   callback=lambda _: finished.set(),
+                                                   error_callback=lambda _: finished.set()),
+                                  time.monotonic() + limit * len(chunk))
+            for chunk, (result, deadline) in list(running.items()):
+                if result.ready():
+                    for index, value in zip(chunk, result.get()):
+                        results[index] = value
+                    del running[chunk]
+            if not running:
+                continue
+            now = time.monotonic()
+            stuck = min(running, key=lambda chunk: running[chunk][1])
+            if running[stuck][1] <= now:
+                del running[stuck]
+                pending.extendleft(sorted(running, reverse=True))
+                return stuck
+            finished.wait(running[stuck][1] - now)
+            finished.clear()
+    return None
+
+
+def score_path(path, timeout=SYNTAX_TIMEOUT):
+    # Archive members are read straight out of the archive
+    text = read_member(path) if split_member(path) else None
+    return score_file(path, timeout, text)
+
+
+def expired_row(path):
+    """Row of an output whose scoring was killed: every metric but the syntax columns."""
+    print(f"{path}: scoring overran its deadline, worker replaced", file=sys.stderr)
+    text = read_member(path) if split_member(path) else None
+    return score_file(path, text=text, python=False)
+
+
+def task_limit(timeout):
+    """Deadline of one scoring task in the pool; the in-worker timeout gets to fire first."""
+    return timeout + TASK_GRACE if timeout else None
+
+
+def score_paths(paths, workers=None, chunksize=16, timeout=SYNTAX_TIMEOUT):
+    return run_pool(partial(score_path, timeout=timeout), paths, workers, chunksize,
+                    limit=task_limit(timeout), expired=expired_row)
+
+
+def output_sha256(path):
+    if not split_member(path):
+        return file_sha256(path)
+    storage, name = locate(path)
+    return hashlib.sha256(storage.read_bytes(name)).hexdigest()
+
+
+def refresh_file(task):
+    """Hash a file and re-score it only if its content changed."""
+    path, known_hash, timeout = task
+    sha256 = output_sha256(path)
+    if sha256 == known_hash:
+        return sha256, None
+    return sha256, score_path(path, timeout)
+
+
+def expired_refresh(task):
+    path = task[0]
+    return output_sha256(path), expired_row(path)
+
+
+def score_incremental(paths, manifest, workers=None, chunksize=16, timeout=SYNTAX_TIMEOUT, reserved=()):
+    """Re-score new or changed files only.
+
+    reserved are the output numbers of the existing table; new files not
+    named outputN.md are numbered above them and above the numbers of
+    deleted files, so they never take over another output's row.
+
+    Returns the rows for all paths, the manifest entries of deleted files,
+    the number of files whose stat changed and the output numbers whose
+    rows belong to a new file (see merge_rows).
+    """
+    keys = [manifest.key(path) for path in paths]
+    first_run = not manifest.entries
+    new = [i for i, key in enumerate(keys) if key not in manifest.entries]
+    stats = [output_stat(path) for path in paths]
+    stale = [i for i, (key, stat) in enumerate(zip(keys, stats)) if not manifest.unchanged(key, stat)]
+
+    tasks = [(paths[i], manifest.known_hash(keys[i]), timeout) for i in stale]
+    results = run_pool(refresh_file, tasks, workers, chunksize, limit=task_limit(timeout), expired=expired_refresh)
+    for i, (sha256, row) in zip(stale, results):
+        previous = manifest.row(keys[i])
+        if row is None:
+            row = previous
+        elif previous is not None and row['output_number'] is None:
+            row['output_number'] = previous['output_number']
+        manifest.record(keys[i], stats[i], sha256, row)
+
+    removed = manifest.prune(set(keys))
+    floor = max([int(number) for number in reserved]
+                + [entry['row']['output_number'] for entry in removed.values()], default=0)
+    rows = number_rows([manifest.row(key) for key in keys], floor)
+    # Keep numbers handed out to new files stable across runs
+    for key, row in zip(keys, rows):
+        manifest.entries[key]['row'] = row
+    # A new file is a moved one when a deleted file had its number and
+    # content; otherwise any row already under its number isn't its own. On
+    # the first run there's nothing to tell them apart, so the table is trusted
+    moved = {(entry['row']['output_number'], entry['sha256']) for entry in removed.values()}
+    new_numbers = set() if first_run else {
+        rows[i]['output_number'] for i in new
+        if (rows[i]['output_number'], manifest.entries[keys[i]]['sha256']) not in moved}
+    return rows, removed, len(stale), new_numbers
+
+
+def number_rows(rows, floor=0):
+    # Files not named outputN.md are numbered after the highest known number
+    for row, number in zip(rows, number_outputs([row['output_number'] for row in rows], floor)):
+        row['output_number'] = number
+    return rows
+
+
+def write_csv(file, rows):
+    writer = csv.DictWriter(file, fieldnames=EVALUATION_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_rows(rows, output):
+    if output == '-':
+        write_csv(sys.stdout, rows)
+    else:
+        atomic_write(output, lambda file: write_csv(file, rows))
+
+
+def merge_rows(existing, rows, removed_numbers, new_numbers=()):
+    """Merge fresh rows into an existing evaluations table.
+
+    Existing rows keep their position and their hand-edited model and access
+    UI labels; their metrics are replaced. Rows of deleted outputs are dropped
+    and outputs seen for the first time are appended by output number. A row
+    whose number is in new_numbers now belongs to a new file, so it takes that
+    file's labels instead of those of whatever had the number before.
+    """
+    fresh = {int(row['output_number']): row for row in rows}
+    new_numbers = {int(number) for number in new_numbers}
+    merged = []
+    for old in existing:
+        number = int(old['output_number'])
+        if number in fresh:
+            row = fresh.pop(number)
+            if number in new_numbers:
+                merged.append(row)
+            else:
+                merged.append(dict(row, model=old['model'] or row['model'],
+                                   accessui=old['accessui'] or row['accessui']))
+        elif number not in removed_numbers:
+            merged.append(old)
+    merged.extend(fresh[number] for number in sorted(fresh))
+    return merged
+
+
+def read_rows(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def update_search_index(index_path, paths, rows, table):
+    """Bring the search index in line with the scored outputs.
+
+    Labels come from the written table, so hand-edited model and access UI
+    names are what the dashboards filter on, and are matched to files by
+    output_labels, as the dashboards match them when they refresh the index.
+    """
+    labels = output_labels(paths, table, [row['output_number'] for row in rows])
+    updated, removed = SearchIndex(index_path).update(paths, labels)
+    print(f"Search index {index_path}: {updated} outputs indexed, {removed} removed")
+
+
+def update_code_indexes(input_dirs, existing_only=False):
+    for folder in input_dirs:
+        if existing_only and not os.path.exists(index_path(folder)):
+            continue
+        updated, removed = CodeBlockIndex(index_path(folder)).update(folder)
+        print(f"Code block index {index_path(folder)}: {updated} outputs scanned, {removed} removed")
+
+
+def update_html_caches(input_dirs, max_mb=None, workers=None, chunksize=16):
+    for folder in input_dirs:
+        cache = HTMLCache(cache_path(folder), None if max_mb is None else max_mb * 1024 * 1024)
+        rendered, read = cache.refresh(folder, workers=workers, chunksize=chunksize)
+        entries, size, stale = cache.stats()
+        print(f"HTML cache {cache_path(folder)}: {rendered} sections rendered from {read} new or changed outputs; "
+              f"{entries} entries, {size / 1024 / 1024:.1f} MB, {stale} from an old renderer")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute character and code-fence metrics for model outputs.")
+    parser.add_argument('inputs', nargs='*', default=[os.path.join(repo_root, 'app', 'data', 'outputs')],
+                        help="Directories of .md outputs or packed .lcgpack archives (default: app/data/outputs)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="CSV file to write in the evaluations.csv schema, '-' for stdout (default)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count; 1 scores in this process when --timeout is 0)")
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help="Files handed to a worker at a time (default: 16)")
+    parser.add_argument('--timeout', type=float, default=SYNTAX_TIMEOUT,
+                        help=f"Seconds allowed for parsing one output's Python blocks (default: {SYNTAX_TIMEOUT})")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-score new or changed outputs and merge them into the existing output CSV")
+    parser.add_argument('--manifest',
+                        help="Manifest sidecar for --incremental (default: <output>.manifest.json)")
+    parser.add_argument('--search-index',
+                        help="SQLite full-text index to update with the scored outputs, e.g. app/data/search-index.sqlite")
+    parser.add_argument('--code-index', action='store_true',
+                        help="Update the code block index next to each input folder (<folder>.codeblocks.json)")
+    parser.add_argument('--html-cache', action='store_true',
+                        help="Pre-render the outputs into the HTML cache next to each input folder (<folder>.html-cache.sqlite)")
+    parser.add_argument('--html-cache-mb', type=int,
+                        help="Size limit of the HTML cache in MB (default: LONGCODEGEN_HTML_CACHE_MB or 256)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and re-score whenever outputs are added, changed or removed (implies --incremental)")
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help="With --watch, seconds the folders must be quiet before re-scoring (default: 2)")
+    parser.add_argument('--poll', action='store_true',
+                        help="With --watch, poll the folders instead of using filesystem events")
+    args = parser.parse_args(argv)
+    args.incremental = args.incremental or args.watch
+    if args.incremental and args.output == '-':
+        parser.error("--incremental and --watch need an output file to merge into")
+    if args.watch and any(is_archive(path) for path in args.inputs):
+        parser.error("--watch needs output folders, not archives")
+    return args
+
+
+def run_incremental(args, paths):
+    manifest = Manifest(args.manifest or manifest_path(args.output))
+    existing = read_rows(args.output)
+    rows, removed, changed, new_numbers = score_incremental(
+        paths, manifest, workers=args.workers, chunksize=args.chunksize, timeout=args.timeout,
+        reserved=[row['output_number'] for row in existing])
+    if not changed and not removed and os.path.exists(args.output):
+        print(f"No outputs changed; {args.output} is up to date")
+        if args.search_index:
+            update_search_index(args.search_index, paths, rows, existing)
+        return
+    removed_numbers = {entry['row']['output_number'] for entry in removed.values()}
+    merged = merge_rows(existing, rows, removed_numbers, new_numbers)
+    # The dashboards pick up a new data version when the CSV is replaced, so
+    # the indexes are brought up to date first
+    if args.search_index:
+        update_search_index(args.search_index, paths, rows, merged)
+    write_rows(merged, args.output)
+    manifest.save()
+    print(f"{changed} of {len(paths)} outputs new or changed, {len(removed)} dropped; saved to {args.output}")
+
+
+def ingest(args):
+    paths = collect_paths(args.inputs)
+    # While watching, code block indexes the dashboards made are kept current
+    # too, so a rewritten output never shows stale block offsets
+    if args.code_index or args.watch:
+        update_code_indexes(args.inputs, existing_only=not args.code_index)
+    if args.html_cache:
+        update_html_caches(args.inputs, args.html_cache_mb, workers=args.workers, chunksize=args.chunksize)
+    if args.incremental:
+        run_incremental(args, paths)
+        return
+    rows = number_rows(score_paths(paths, workers=args.workers, chunksize=args.chunksize,
+                                   timeout=args.timeout))
+    if args.search_index:
+        update_search_index(args.search_index, paths, rows, rows)
+    write_rows(rows, args.output)
+    if args.output != '-':
+        print(f"Report generated and saved to {args.output} ({len(rows)} outputs)")
+
+
+def watch(args):
+    """Re-run ingest after every settled batch of changes until interrupted."""
+    watcher = FolderWatcher(args.inputs, debounce=args.debounce, use_events=not args.poll)
+    print(f"Watching {', '.join(args.inputs)} for changes ({watcher.mode}); press Ctrl+C to stop")
+    try:
+        while True:
+            watcher.wait()
+            try:
+                ingest(args)
+            except OSError as error:
+                # Usually a file that vanished mid-scan; the next change retries
+                print(f"Ingest failed, will retry on the next change: {error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ingest(args)
+    if args.watch:
+        watch(args)
+
+
+if __name__ == '__main__':
+    main()
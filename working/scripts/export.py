@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import argparse
+
+# Make the shared longcodegen package importable when run as a script
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, repo_root)
+
+from longcodegen.archive import EXTENSION
+from longcodegen.export import export_site
+from longcodegen.storage import resolve_outputs
+
+data_dir = os.path.join(repo_root, 'app', 'data')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export the dashboard as a static site. Only pages whose inputs "
+                                                 "changed since the last export are rendered again.")
+    parser.add_argument('site', help="Directory to write the site into")
+    parser.add_argument('--evaluations', default=os.path.join(data_dir, 'evaluations.csv'),
+                        help="Evaluations table (default: app/data/evaluations.csv)")
+    parser.add_argument('--outputs', default=os.path.join(data_dir, 'outputs'),
+                        help=f"Folder of .md outputs or a packed {EXTENSION} archive (default: app/data/outputs)")
+    parser.add_argument('--prompt', default=os.path.join(data_dir, 'prompts', 'prompt.md'),
+                        help="Prompt shown on the Prompt page (default: app/data/prompts/prompt.md)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count, 1 disables the pool)")
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help="Outputs handed to a worker at a time (default: 16)")
+    args = parser.parse_args(argv)
+    args.outputs = resolve_outputs(args.outputs)
+    for path in (args.evaluations, args.outputs, args.prompt):
+        if not os.path.exists(path):
+            parser.error(f"'{path}' does not exist. Please check the path.")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    written, pages, removed = export_site(args.site, args.evaluations, args.outputs, args.prompt,
+                                          workers=args.workers, chunksize=args.chunksize)
+    print(f"Exported {args.site}: {written} of {pages} files written, {removed} removed "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
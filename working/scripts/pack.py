@@ -0,0 +1,44 @@
+import os
+import sys
+import argparse
+
+# Make the shared longcodegen package importable when run as a script
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, repo_root)
+
+from longcodegen.archive import EXTENSION, open_archive, pack_folder
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pack a folder of outputs into a single compressed archive, "
+                                                 "or list the contents of one.")
+    parser.add_argument('source', help="Folder of .md outputs to pack, or an archive with --list")
+    parser.add_argument('-o', '--output', help=f"Archive to write (default: <folder>{EXTENSION})")
+    parser.add_argument('--level', type=int, default=6, choices=range(0, 10), metavar='0-9',
+                        help="zlib compression level (default: 6)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count, 1 disables the pool)")
+    parser.add_argument('--list', action='store_true', help="List the entries of an archive")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        archive = open_archive(args.source)
+        for name in archive.names():
+            entry = archive.entries[name]
+            print(f"{entry.size:>10} {entry.length:>10}  {name}")
+        return
+
+    if not os.path.isdir(args.source):
+        raise SystemExit(f"Source folder '{args.source}' does not exist. Please check the path.")
+    output = args.output or os.path.normpath(args.source) + EXTENSION
+    count = pack_folder(args.source, output, level=args.level, workers=args.workers)
+    size = sum(os.path.getsize(os.path.join(args.source, name)) for name in os.listdir(args.source)
+               if name.endswith('.md'))
+    print(f"Packed {count} outputs into {output} ({size} bytes -> {os.path.getsize(output)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
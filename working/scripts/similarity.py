@@ -0,0 +1,50 @@
+import os
+import sys
+import csv
+import argparse
+
+# Make the shared longcodegen package importable when run as a script
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, repo_root)
+
+from longcodegen.archive import is_archive
+from longcodegen.similarity import near_duplicates
+from longcodegen.storage import open_storage
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="List near-duplicate outputs using MinHash signatures and LSH.")
+    parser.add_argument('inputs', nargs='*', default=[os.path.join(repo_root, 'app', 'data', 'outputs')],
+                        help="Directories of .md outputs or packed .lcgpack archives (default: app/data/outputs)")
+    parser.add_argument('-o', '--output', default='-', help="CSV file to write the pairs to, '-' for stdout (default)")
+    parser.add_argument('-t', '--threshold', type=float, default=0.5,
+                        help="Minimum estimated Jaccard similarity of word shingles (default: 0.5)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count, 1 disables the pool)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = []
+    for folder in args.inputs:
+        if not is_archive(folder) and not os.path.isdir(folder):
+            raise SystemExit(f"Source folder '{folder}' does not exist. Please check the path.")
+        storage = open_storage(folder)
+        paths.extend(storage.path_of(name) for name in storage.names())
+
+    pairs = near_duplicates(paths, args.threshold, args.workers)
+    csvfile = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        writer = csv.writer(csvfile)
+        writer.writerow(['first', 'second', 'similarity'])
+        writer.writerows((first, second, f"{similarity:.3f}") for first, second, similarity in pairs)
+    finally:
+        if csvfile is not sys.stdout:
+            csvfile.close()
+    if args.output != '-':
+        print(f"{len(pairs)} similar pairs among {len(paths)} outputs saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()